@@ -1,6 +1,9 @@
+from datetime import date
+
 import streamlit as st
-import sqlite3
-import pandas as pd
+
+from supermercado import (BaseOcupada, Carrito, Diario, Registro, abrir, analisis, archivo, busqueda, consultas,
+                         importacion, inventario, remarcacion, reportes, reposicion, respaldo)
 
 st.set_page_config(
     page_title="SuperMarket",
@@ -57,220 +60,165 @@ def centrar_texto(texto, tamanho, color):
 # -----------------------------------------------------------------------------------------------------------------------------
 
 # Funciones de backend
-# Conectar a la base de datos
-
-
-def conectar_base(base):
-    con = sqlite3.connect(base)
-    cur = con.cursor()
-    return con, cur
-
-
-def base_ventas():
-    con = sqlite3.connect('ventas.db')
-    cur = con.cursor()
-
-    # Verificar si la tabla ya existe
-    cur.execute("PRAGMA table_info(ventas);")
-    if not cur.fetchall():
-        # La tabla no existe, la creamos
-        cur.execute('''CREATE TABLE IF NOT EXISTS ventas
-                    (id_venta INTEGER PRIMARY KEY AUTOINCREMENT,
-                    codigo INTEGER,
-                    producto VARCHAR(200) NOT NULL,
-                    cantidad INTEGER NOT NULL,
-                    FOREIGN KEY (codigo) REFERENCES stock(codigo))''')
-    return con, cur
-
-
-def base_precios():
-    con = sqlite3.connect('precios.db')
-    cur = con.cursor()
-
-    # Verificar si la tabla ya existe
-    cur.execute("PRAGMA table_info(precios);")
-    if not cur.fetchall():
-        # La tabla no existe, la creamos
-        cur.execute('''CREATE TABLE IF NOT EXISTS precios
-                (id_precio INTEGER PRIMARY KEY AUTOINCREMENT,
-                codigo INTEGER,
-                producto VARCHAR(200) NOT NULL,
-                precio_compra REAL,
-                precio_venta REAL,
-                FOREIGN KEY (codigo, producto) REFERENCES stock(codigo, producto))''')
-
-    return con, cur
-
-
-def base_stock():
-    con = sqlite3.connect('stock.db')
-    cur = con.cursor()
-
-    # Verificar si la tabla ya existe
-    cur.execute("PRAGMA table_info(stock);")
-    if not cur.fetchall():
-        # La tabla no existe, la creamos
-        cur.execute('''CREATE TABLE IF NOT EXISTS stock
-                    (codigo INTEGER PRIMARY KEY AUTOINCREMENT,
-                    producto VARCHAR(200) NOT NULL,
-                    cantidad INTEGER NOT NULL)''')
-    return con, cur
-
-# Mostrar datos de la base de datos
-
-
-def mostrar_db(base):
-    con, cur = conectar_base(base)
-    data = cur.execute(f'SELECT * FROM {base} ORDER BY codigo')
-    st.dataframe(data,
-                 width=700,
-                 hide_index=True)
+# Conectar a la base de datos (un solo pool por proceso, compartido entre sesiones).
+# Las tablas e indices se crean o actualizan una sola vez, al construir el pool
 
-# Agregar datos a la base de datos
 
+@st.cache_resource
+def obtener_registro():
+    # Tiempos de SQL y de cada rerun, con log rotativo en JSON lines
+    return Registro(log='diagnostico.jsonl')
 
-def agregar_ventas(producto, cantidad, status):
-    if not status:
-        # Conectar a la base de datos "stock.db"
-        con_stock, cur_stock = base_stock()
 
-        # Verificar si existe el producto
-        cur_stock.execute(
-            "SELECT codigo FROM stock WHERE producto=?", (producto,))
-        result_3 = cur_stock.fetchone()
+@st.cache_resource
+def obtener_repositorio():
+    return abrir('.', registro=obtener_registro())
 
-        if result_3 is not None:
-            codigo = result_3[0]
 
-            # Conectar a la base de datos "ventas.db"
-            con, cur = base_ventas()
+@st.cache_resource
+def obtener_respaldos():
+    # Un respaldo por dia en segundo plano, ademas de los que se pidan desde Consultas
+    respaldos = respaldo.Respaldos(obtener_repositorio().pool)
+    respaldos.programar(cada=24 * 3600)
+    return respaldos
 
-            # Insertar datos en la tabla
-            cur.execute('INSERT INTO ventas (codigo, producto, cantidad) VALUES (?, ?, ?)',
-                        (codigo, producto, cantidad))
-            con.commit()
-            con.close()
-        else:
-            st.warning(f"No se encontró el producto {producto} en el stock. La venta no se registró.", icon="⚠️")
-    else:
-        st.info(f"La venta del producto {producto} fue cancelada y no se registró en el stock.", icon="ℹ️")
 
+@st.cache_resource
+def obtener_diario(caja):
+    # Un diario por caja, compartido por sus sesiones; el hilo lo aplica a las bases
+    diario = Diario(obtener_repositorio().pool, caja)
+    diario.iniciar()
+    return diario
 
-def agregar_precio(producto_2, precio_compra, precio_venta):
-    # Conectar a la base de datos "stock.db"
-    con_stock, cur_stock = base_stock()
 
-    # Verificar si existe el producto
-    cur_stock.execute(
-        "SELECT codigo FROM stock WHERE producto=?", (producto_2,))
-    result_3 = cur_stock.fetchone()
+repo = obtener_repositorio()
+registro = obtener_registro()
+respaldos = obtener_respaldos()
+registro.iniciar_rerun()
 
-    codigo = result_3[0]
 
-    # Conectar a la base de datos "precios.db"
-    con_precios, cur_precios = base_precios()
+def cerrar_rerun():
+    # Panel de diagnostico (opcional) y cierre de la medicion del rerun
+    if st.session_state.get('diagnostico'):
+        with st.sidebar:
+            st.caption("Tiempos por pantalla (ms)")
+            st.dataframe(registro.resumen(), hide_index=True)
+            st.caption("Consultas más costosas")
+            st.dataframe(registro.top_sentencias(), hide_index=True)
+    registro.terminar_rerun()
 
-    # Insertar datos en la tabla precios
-    cur_precios.execute('INSERT INTO precios (codigo, producto, precio_compra, precio_venta) '
-                        'VALUES (?, ?, ?, ?)',
-                        (codigo, producto_2, precio_compra, precio_venta))
 
-    con_precios.commit()
-    con_stock.close()
-    con_precios.close()
+def detener():
+    cerrar_rerun()
+    st.stop()
 
 
-def modificar_precio(producto_2, precio_compra, precio_venta):
-    # Conectar a la base de datos "precios.db"
-    con_precios, cur_precios = base_precios()
-
-    # Actualizar datos en la tabla precios
-    cur_precios.execute('UPDATE precios SET precio_compra=?, precio_venta=? WHERE producto=?',
-                        (precio_compra, precio_venta, producto_2))
-
-    con_precios.commit()
-    con_precios.close()
+def reiniciar():
+    registro.terminar_rerun()
+    st.rerun()
 
 # Agregar datos a la base de datos
 
 
 def agregar_productos(producto_1, cantidad_1):
-    con, cur = base_stock()
     # Insertar datos en la tabla
-    cur.execute('INSERT INTO stock (producto, cantidad) VALUES (?, ?)',
-                (producto_1, cantidad_1))
-    con.commit()
-    st.caption(f"Se han agregado {cantidad_1} unidades del producto {producto_1}. Stock: {cantidad_1}")
-    con.close()
-
-# Agregar datos a la base de datos
-
-
-def quitar_productos(producto, cantidad):
-    con = sqlite3.connect('stock.db')
-    cur = con.cursor()
-
-    # Verificar si hay suficiente stock del producto
-    cur.execute("SELECT cantidad FROM stock WHERE producto=?", (producto,))
-    result = cur.fetchone()
-
-    if result is None:
-        st.warning(f"No se encontró el producto {producto} en el stock.")
-    else:
-        stock_actual = result[0]
-        if stock_actual < cantidad:
-            st.warning(f"No hay suficiente stock del producto {producto}. Stock actual: {stock_actual}")
-        else:
-            # Actualizar el stock restando la cantidad vendida
-            nuevo_stock = stock_actual - cantidad
-            cur.execute("UPDATE stock SET cantidad=? WHERE producto=?",
-                        (nuevo_stock, producto))
-            # Confirmar los cambios en la base de datos
-            con.commit()
-            st.success(f"Se han descontado {cantidad} unidades del producto {producto}. Nuevo stock: {nuevo_stock}")
-
-    con.close()
+    if repo.insertar_producto(producto_1, cantidad_1):
+        st.caption(f"Se han agregado {cantidad_1} unidades del producto {producto_1}. Stock: {cantidad_1}")
+        return True
+    st.warning("El producto ya existe, seleccione 'Producto existete'", icon="⚠️")
+    return False
 
 
 def sumar_productos(producto_1, cantidad_1):
-    con = sqlite3.connect('stock.db')
-    cur = con.cursor()
-
-    # Verificar si hay suficiente stock del producto
-    cur.execute("SELECT cantidad FROM stock WHERE producto=?", (producto_1,))
-    result_2 = cur.fetchone()
-
-    stock_actual = result_2[0]
-    nuevo_stock_2 = stock_actual + cantidad_1
-    cur.execute("UPDATE stock SET cantidad=? WHERE producto=?",
-                (nuevo_stock_2, producto_1))
-    # Confirmar los cambios en la base de datos
-    con.commit()
+    nuevo_stock_2 = repo.sumar_cantidad(producto_1, cantidad_1)
     st.caption(f"Se han sumado {cantidad_1} unidades del producto {producto_1}. Nuevo stock: {nuevo_stock_2}")
-    con.close()
 
 
-def mostrar_dataframe(base):
-    df = f'{base}.db'
-    con = sqlite3.connect(df)
-    cur = con.cursor()
-    data_df_2 = pd.read_sql_query(f'SELECT * FROM {base}', con)
-    st.dataframe(data_df_2, hide_index=True)
-    con.close()
-
+def importar_archivo(clave):
+    # Importacion masiva desde CSV/XLSX: todo el archivo en una sola transaccion
+    archivo = st.file_uploader("Archivo CSV o Excel (columnas: producto, cantidad, precio_compra, precio_venta)",
+                               type=['csv', 'xlsx'], key=f'{clave}_archivo')
+    if archivo is not None and st.button("Importar", key=f'{clave}_importar'):
+        try:
+            resumen = importacion.importar(repo.pool, archivo, archivo.name)
+        except ValueError as error:
+            st.warning(str(error), icon="⚠️")
+            return
+        col35, col36, col37, col38 = st.columns(4)
+        col35.metric("Productos nuevos", resumen.insertados)
+        col36.metric("Productos sumados", resumen.actualizados)
+        col37.metric("Precios cargados", resumen.precios)
+        col38.metric("Filas rechazadas", len(resumen.rechazados))
+        if not resumen.rechazados.empty:
+            st.dataframe(resumen.rechazados, hide_index=True)
+
+
+def remarcar_precios():
+    # Remarcacion masiva: vista previa calculada sobre toda la tabla y un solo UPDATE al aplicar
+    with st.form("Remarcar"):
+        col60, col61, col62 = st.columns(3)
+        with col60:
+            tipo = st.radio("Regla", ["Porcentaje sobre precio de venta", "Markup sobre precio de compra"])
+        with col61:
+            valor = st.number_input("Porcentaje", value=0.0, step=1.0)
+        with col62:
+            redondeo = st.selectbox("Redondeo", ["Sin redondeo", "0.90", "0.99"])
+        col63, col64 = st.columns(2)
+        with col63:
+            texto = st.text_input("Solo productos que contengan..")
+        with col64:
+            margen_maximo = st.number_input("Solo con margen menor a (%), 0 = todos", min_value=0.0)
+        button_vista = st.form_submit_button('Vista previa')
+    if button_vista:
+        regla = remarcacion.Regla('porcentaje' if tipo.startswith("Porcentaje") else 'markup', valor,
+                                  None if redondeo == "Sin redondeo" else float(redondeo))
+        filtro = remarcacion.Filtro(texto, margen_maximo or None)
+        st.session_state.vista_remarcacion = remarcacion.vista_previa(repo.pool, regla, filtro)
+
+    vista = st.session_state.get('vista_remarcacion')
+    if vista is not None:
+        st.dataframe(vista, hide_index=True)
+        st.caption(f"{len(vista)} precios a modificar")
+        if not vista.empty and st.button("Aplicar"):
+            modificados = remarcacion.aplicar(repo.pool, vista)
+            del st.session_state.vista_remarcacion
+            st.caption(f"Se modificaron {modificados} precios")
 
-# -------------------------------------------------------------------------------------------------------------------------
-# Crear la base de datos si no existe
-con, cur = base_stock()
-con.close()
 
-# Crear la base de datos si no existe
-con, cur = base_ventas()
-con.close()
+def mostrar_dataframe(base):
+    # Filtros, orden y paginado se resuelven en SQL: solo se trae la pagina visible
+    columnas = list(consultas.columnas(repo.pool, base))
+    col30, col31, col32, col33, col34 = st.columns([2, 3, 2, 1, 1])
+    with col30:
+        columna_filtro = st.selectbox("Filtrar por", columnas, key=f'{base}_columna_filtro')
+    with col31:
+        valor_filtro = st.text_input("Valor", key=f'{base}_valor_filtro')
+    with col32:
+        orden = st.selectbox("Ordenar por", columnas, key=f'{base}_orden')
+    with col33:
+        descendente = st.checkbox("Desc.", key=f'{base}_descendente')
+    with col34:
+        tamanho = st.selectbox("Filas", [25, 50, 100, 500], index=1, key=f'{base}_tamanho')
+
+    filtros = {columna_filtro: valor_filtro}
+    try:
+        total = consultas.contar(repo.pool, base, filtros)
+    except ValueError as error:
+        st.warning(str(error), icon="⚠️")
+        return
+    total_paginas = max(1, -(-total // tamanho))
+    numero = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas,
+                             key=f'{base}_pagina')
+    resultado = consultas.pagina(repo.pool, base, filtros, orden, descendente,
+                                 numero=numero - 1, tamanho=tamanho, total=total)
+    st.dataframe(resultado.datos, hide_index=True)
+    st.caption(f"{resultado.total} filas")
+
+    # El CSV se genera recien al hacer clic, por bloques y fuera del rerun de la pagina
+    st.download_button("Descargar CSV",
+                       lambda: consultas.archivo_csv(repo.pool, base, filtros, orden, descendente),
+                       file_name=f'{base}.csv', mime='text/csv', on_click='ignore', key=f'{base}_descargar_csv')
 
-# Crear la base de datos si no existe
-con, cur = base_precios()
-con.close()
 
 # -------------------------------------------------------------------------------------------------------------------------
 # Configuracion del sidebar
@@ -285,7 +233,13 @@ if tipo_operacion == 'Consultas':
                                      "Productos",
                                      "Precios",
                                      "Stock",
-                                     "Compras"])
+                                     "Compras",
+                                     "Resumen",
+                                     "Inventario",
+                                     "Reposicion",
+                                     "Analisis",
+                                     "Historial de ventas",
+                                     "Respaldos"])
 else:
     opciones = st.sidebar.selectbox("Elija una opcion..",
                                     ["Ventas",
@@ -293,6 +247,8 @@ else:
                                      "Ingreso de mercaderia",
                                      "Precios"
                                      ])
+st.sidebar.checkbox("Diagnóstico", key='diagnostico')
+registro.marcar_pantalla(f'{tipo_operacion}/{opciones}')
 # -----------------------------------------------------------------------------------------------------------------------------
 # Formulario de ventas
 
@@ -300,28 +256,50 @@ else:
 # Utilizar sesiones para mantener la información entre ejecuciones
 session_state = st.session_state
 
-if 'ventas_temporales' not in session_state:
-    session_state.ventas_temporales = []
+# Carrito de la venta en curso: lineas por producto con el total acumulado
+if 'carrito' not in session_state:
+    session_state.carrito = Carrito()
+carrito = session_state.carrito
 
-if 'df_ventas_temporales' not in session_state:
-    session_state.df_ventas_temporales = pd.DataFrame(
-        columns=['Producto', 'Cantidad', 'Precio', 'Subtotal', 'Status'])
+# El selector de caja solo se dibuja en Ventas; reasignarlo evita que Streamlit descarte el valor
+# en las otras pantallas y la sesion vuelva a la caja 1
+if 'caja' in session_state:
+    session_state.caja = session_state.caja
 
 # Variable para controlar si se debe finalizar
 finalizar = False
-total_ventas = 0
-df = []
 
 if tipo_operacion == "Ingresos" and opciones == "Ventas":
-    # Crear la base de datos si no existe
-    con = sqlite3.connect('stock.db')
-    data_df = pd.read_sql_query('SELECT * FROM stock', con)
-    con.close()
-
     # ==========================front-end==========================
+    # "Finalizar" anota el ticket en el diario de la caja; las ventas se registran en segundo plano
+    caja = st.sidebar.number_input("Caja", min_value=1, step=1, key='caja')
+    diario = obtener_diario(int(caja))
+    if diario.pendientes:
+        st.sidebar.warning(f"{diario.pendientes} tickets pendientes de registrar", icon="⏳")
+    if diario.error is not None:
+        st.sidebar.caption(f"Reintentando: {diario.error}")
+
+    # Resultado del ultimo "Finalizar" (se muestra despues del rerun)
+    if 'ticket_anotado' in session_state:
+        st.success(f"Venta anotada (ticket {session_state.pop('ticket_anotado')[:8]}).")
+    # Rechazos y alertas de los tickets ya aplicados
+    for resultado in diario.vaciar_avisos():
+        for producto_r, cantidad_r, motivo in resultado.rechazadas:
+            st.warning(f"No se registró la venta de {cantidad_r} unidades de {producto_r}: {motivo}.", icon="⚠️")
+        for producto_r, cantidad_r in resultado.alertas:
+            st.info(f"{producto_r} necesita reposición (quedan {cantidad_r} unidades).")
+
     centrar_texto("Ingrese una venta", 3, 'white')
     col100, col101 = st.columns([4, 8])
     with col100:
+        # La busqueda va fuera del formulario para que la lista se actualice al escribir;
+        # solo se mandan al navegador los primeros resultados
+        busqueda_producto = st.text_input("Buscar producto o código...")
+        if busqueda_producto:
+            lista_productos = [nombre for _, nombre in
+                               busqueda.buscar_productos(repo.pool, busqueda_producto, limite=20)]
+        else:
+            lista_productos = repo.productos()[:20]
         with st.form("Ventas"):
             col00, col01, col02 = st.columns([1.3, 1.7, 1.3])
             col03, col04, col05 = st.columns([1, 4, 1])
@@ -337,28 +315,22 @@ if tipo_operacion == "Ingresos" and opciones == "Ventas":
                 cantidad = st.number_input("Cantidad", min_value=1)
             with col04:
                 producto = st.selectbox("Elija el producto...",
-                                        data_df['producto'].sort_values())
+                                        lista_productos)
 
         # =--=--=--=--=--=--=--=--=--=Back-end=--=--=--=--=--=--=--=--=--=
-            # Conectar a la base de datos "stock.db"
-            con_precio, cur_precio = base_precios()
-            # Verificar si existe el producto
-            cur_precio.execute(
-                "SELECT precio_venta FROM precios WHERE producto=?", (producto,))
-            result_3 = cur_precio.fetchone()
-            precio_unitario = result_3[0]
-            status = False
-            sub_total = precio_unitario * cantidad
+            # Precio vigente, servido desde el catalogo en memoria (None si el producto no tiene precio)
+            precio_unitario = repo.precio_venta(producto) if producto is not None else 0
+            sub_total = None if precio_unitario is None else precio_unitario * cantidad
 
         # ==========================front-end==========================
             with col07:
                 centrar_texto("Precio unitario", 5, 'lightblue')
             with col10:
-                centrar_texto(f'R$ {precio_unitario:.2f}', 3, 'white')
+                centrar_texto('Sin precio' if precio_unitario is None else f'R$ {precio_unitario:.2f}', 3, 'white')
             with col13:
                 centrar_texto('Sub-Total', 5, 'lightblue')
             with col16:
-                centrar_texto(f'R$ {sub_total:.2f}', 3, 'white')
+                centrar_texto('-' if sub_total is None else f'R$ {sub_total:.2f}', 3, 'white')
             with col19:
                 centrar_texto('Total', 5, 'lightblue')
             with col25:
@@ -367,22 +339,21 @@ if tipo_operacion == "Ingresos" and opciones == "Ventas":
                 st.caption("")
 
         # =--=--=--=--=--=--=--=--=--=Back-end=--=--=--=--=--=--=--=--=--=
-                if button_agregar:
-                    venta_actual = {'Producto': producto, 'Cantidad': cantidad,
-                                    'Precio': precio_unitario, 'Subtotal': sub_total, 'Status': status}
-                    session_state.ventas_temporales.append(venta_actual)
-                    session_state.df_ventas_temporales = pd.DataFrame(
-                        session_state.ventas_temporales)
-                    # Sumar todas las ventas
-                    total_ventas = sum(venta['Subtotal']
-                                       for venta in session_state.ventas_temporales)
+                if button_agregar and producto is None:
+                    st.warning("No hay productos que coincidan con la búsqueda", icon="⚠️")
+                elif button_agregar and precio_unitario is None:
+                    st.warning(f"{producto} no tiene precio de venta; cárguelo en Ingresos > Precios", icon="⚠️")
+                elif button_agregar:
+                    # Un producto repetido suma cantidad en su linea; el total se actualiza en el momento
+                    carrito.agregar(producto, cantidad, precio_unitario)
 
         # ==========================front-end==========================
             with col22:
-                centrar_texto(f'R$ {total_ventas:.2f}', 3, 'white')
+                centrar_texto(f'R$ {carrito.total:.2f}', 3, 'white')
     with col101:
         with st.form('Tabla_ventas'):
-            edited_data = st.data_editor(session_state.df_ventas_temporales.tail(11), width=800, height=452, hide_index=True,
+            edited_data = st.data_editor(carrito.tabla(), width=800, height=452, hide_index=True,
+                                         disabled=['Producto', 'Cantidad', 'Precio', 'Subtotal'],
                                          column_config={
                 "Producto": st.column_config.TextColumn(
                     "Producto",
@@ -430,43 +401,60 @@ if tipo_operacion == "Ingresos" and opciones == "Ventas":
 
             # Acciones al presionar "Finalizar"
             if finalizar:
-                # Obtener los datos editados por el usuario desde el data editor
-                for index, row in edited_data.iterrows():
-                    ventas_actuales = {'Producto': row['Producto'], 'Cantidad': row['Cantidad'],
-                                       'Precio': row['Precio'], 'Subtotal': row['Subtotal'], 'Status': row['Status']}
-                    df.append(ventas_actuales)
-
-                # Realizar las acciones de finalización
-                for venta in df:
-                    agregar_ventas(venta['Producto'],
-                                   venta['Cantidad'], venta['Status'])
-                    if not venta['Status']:
-                        quitar_productos(venta['Producto'], venta['Cantidad'])
-
-                # Reiniciar el DataFrame
-                session_state.df_ventas_temporales = pd.DataFrame(
-                    columns=['Producto', 'Cantidad', 'Precio', 'Subtotal', 'Status'])
-                # También puedes reiniciar la lista si lo deseas
-                session_state.ventas_temporales = []
-                st.rerun()
-                st.success("Ventas registradas y stock actualizado con éxito.")
+                # Las lineas tildadas como canceladas en la tabla no se registran
+                carrito.aplicar_cancelaciones(edited_data['Status'].tolist())
+
+                # Realizar las acciones de finalización: el ticket queda en el diario de la caja
+                lineas = carrito.lineas_a_cobrar()
+                if lineas:
+                    session_state.ticket_anotado = diario.anotar(lineas)
+
+                # Vaciar el carrito
+                carrito.vaciar()
+                reiniciar()
 # -----------------------------------------------------------------------------------------------------------------------------
 # Ingreso de mercaderia
 if tipo_operacion == "Ingresos" and opciones == "Ingreso de mercaderia":
     centrar_texto("Ingrese un producto", 3, 'white')
     radio = st.radio("Elija una opción", [
-                     "***Nuevo producto***", "***Producto existente***"])
+                     "***Nuevo producto***", "***Producto existente***", "***Importar archivo***",
+                     "***Ajuste por conteo***", "***Niveles de reposicion***"])
+    if radio == "***Importar archivo***":
+        importar_archivo('mercaderia')
+        detener()
+    if radio == "***Ajuste por conteo***":
+        # El stock pasa a ser lo contado y la diferencia queda anotada como ajuste
+        with st.form("Ajuste"):
+            producto_3 = st.selectbox("Elija el producto...", repo.productos())
+            contada = st.number_input("Cantidad contada..", min_value=0)
+            if st.form_submit_button('Finalizar'):
+                diferencia = None if producto_3 is None else inventario.ajustar(repo.pool, producto_3, contada,
+                                                                                  referencia='conteo')
+                if diferencia is None:
+                    st.warning("Elija un producto existente", icon="⚠️")
+                else:
+                    st.caption(f"Stock ajustado a {contada} unidades ({diferencia:+d})")
+        detener()
+    if radio == "***Niveles de reposicion***":
+        # Con stock igual o menor al minimo el producto pasa a la lista de reposicion
+        with st.form("Niveles"):
+            producto_4 = st.selectbox("Elija el producto...", repo.productos())
+            minimo = st.number_input("Stock mínimo..", min_value=0)
+            objetivo = st.number_input("Reponer hasta.. (0 = según ventas)", min_value=0)
+            if st.form_submit_button('Finalizar'):
+                if producto_4 is not None and reposicion.fijar_nivel(repo.pool, producto_4, minimo, objetivo or None):
+                    st.caption("Niveles guardados con exito!!")
+                else:
+                    st.warning("Elija un producto existente", icon="⚠️")
+        detener()
     with st.form("Ventas"):
         if radio == "***Nuevo producto***":
             producto_1 = st.text_input('Ingrese un producto..')
             cantidad_1 = st.number_input("Ingrese cantidad..", min_value=0)
 
         elif radio == "***Producto existente***":
-            con = sqlite3.connect('stock.db')
-            data_df_2 = pd.read_sql_query('SELECT * FROM stock', con)
-            con.close()
             producto_1 = st.selectbox(
-                "Elija el producto...", data_df_2['producto'].sort_values())
+                "Elija el producto...", repo.productos())
             cantidad_1 = st.number_input("Ingrese cantidad..", min_value=0)
 
         button_003 = st.form_submit_button('Finalizar')
@@ -476,17 +464,8 @@ if tipo_operacion == "Ingresos" and opciones == "Ingreso de mercaderia":
                     st.caption("Datos faltantes")
                 else:
                     # Verificar si el producto ya tiene precio de venta
-                    con_ver = sqlite3.connect('stock.db')
-                    cur_ver = con_ver.cursor()
-                    cur_ver.execute(
-                        "SELECT producto FROM stock WHERE producto=?", (producto_1,))
-                    result_3 = cur_ver.fetchone()
-                    if result_3 is None:
-                        agregar_productos(producto_1, cantidad_1)
+                    if agregar_productos(producto_1, cantidad_1):
                         st.caption("Producto agregado con exito!!")
-                    else:
-                        st.warning(
-                            "El producto ya existe, seleccione 'Producto existete'", icon="⚠️")
             else:
                 if producto_1 == "" or cantidad_1 == 0:
                     st.caption("Datos faltantes")
@@ -498,14 +477,18 @@ if tipo_operacion == "Ingresos" and opciones == "Ingreso de mercaderia":
 if tipo_operacion == "Ingresos" and opciones == "Precios":
     centrar_texto("Precios", 3, 'white')
     radio_2 = st.radio("Elija una opción", [
-        "***Nuevo precio***", "***Modificar precio***"])
+        "***Nuevo precio***", "***Modificar precio***", "***Importar lista de precios***",
+        "***Remarcar precios***"])
+    if radio_2 == "***Importar lista de precios***":
+        importar_archivo('precios')
+        detener()
+    if radio_2 == "***Remarcar precios***":
+        remarcar_precios()
+        detener()
     with st.form("Precios"):
         if radio_2 == "***Nuevo precio***":
-            con = sqlite3.connect('stock.db')
-            data_df_3 = pd.read_sql_query('SELECT * FROM stock', con)
-            con.close()
             producto_2 = st.selectbox(
-                "Elija el producto...", data_df_3['producto'].sort_values())
+                "Elija el producto...", repo.productos())
 
             precio_compra = st.number_input("Precio de compra", min_value=0.00)
             precio_venta = st.number_input("Precio de venta", min_value=0.00)
@@ -513,50 +496,35 @@ if tipo_operacion == "Ingresos" and opciones == "Precios":
             button_4 = st.form_submit_button('Finalizar')
             if button_4:
                 # Verificar si el producto ya tiene precio de venta
-                con_ver = sqlite3.connect('precios.db')
-                cur_ver = con_ver.cursor()
-                cur_ver.execute(
-                    "SELECT precio_venta FROM precios WHERE producto=?", (producto_2,))
-                result_3 = cur_ver.fetchone()
-                cur_ver.execute(
-                    "SELECT precio_compra FROM precios WHERE producto=?", (producto_2,))
-                result_4 = cur_ver.fetchone()
+                result_3 = repo.precios_de(producto_2)
                 if result_3 is None:
-                    agregar_precio(producto_2, precio_compra, precio_venta)
+                    repo.agregar_precio(producto_2, precio_compra, precio_venta)
                     st.caption("Precio agregado con exito!!")
                 else:
-                    precio_v_actual = result_3[0]
-                    precio_c_actual = result_4[0]
+                    precio_c_actual, precio_v_actual = result_3
                     st.warning(f"Item con precio de compra vigente de R$ {precio_c_actual}")
                     st.warning(f"Item con precio de venta vigente de R$ {precio_v_actual}")
                     st.warning(
                         "Selecciona la opcion 'Modificar precio'", icon="⚠️")
-                    st.stop()
+                    detener()
 
         elif radio_2 == "***Modificar precio***":
-            con = sqlite3.connect('stock.db')
-            data_df_3 = pd.read_sql_query('SELECT * FROM stock', con)
-            con.close()
             producto_2 = st.selectbox(
-                "Elija el producto...", data_df_3['producto'].sort_values())
+                "Elija el producto...", repo.productos())
 
             precio_compra = st.number_input("Precio de compra", min_value=0.00)
             precio_venta = st.number_input("Precio de venta", min_value=0.00)
             button_4 = st.form_submit_button('Finalizar')
             if button_4:
                 # Verificar si el producto ya tiene precio de venta
-                con_ver = sqlite3.connect('precios.db')
-                cur_ver = con_ver.cursor()
-                cur_ver.execute(
-                    "SELECT precio_venta FROM precios WHERE producto=?", (producto_2,))
-                result_3 = cur_ver.fetchone()
+                result_3 = repo.precios_de(producto_2)
                 # precio_actual = result_3[0]
                 if result_3 is None:
                     st.warning(
                         'Esta no es la opcion para un nuevo precio', icon="⚠️")
-                    st.stop()
+                    detener()
                 else:
-                    modificar_precio(producto_2, precio_compra, precio_venta)
+                    repo.actualizar_precio(producto_2, precio_compra, precio_venta)
                     st.caption("Precio modificado con exito")
 
 # -----------------------------------------------------------------------------------------------------------------------------
@@ -572,3 +540,92 @@ if tipo_operacion == "Consultas" and opciones == "Stock":
     mostrar_dataframe("stock")
 if tipo_operacion == "Consultas" and opciones == "Compras":
     mostrar_dataframe("stock")
+if tipo_operacion == "Consultas" and opciones == "Resumen":
+    # Leido de las tablas de resumen, no del historial completo de ventas
+    centrar_texto("Resumen de ventas", 3, 'white')
+    col40, col41 = st.columns(2)
+    with col40:
+        desde = st.date_input("Desde", value=None)
+    with col41:
+        hasta = st.date_input("Hasta", value=None)
+    por_dia = reportes.ventas_por_dia(repo.pool, desde, hasta)
+    col42, col43, col44 = st.columns(3)
+    col42.metric("Importe", f"R$ {por_dia['importe'].sum():.2f}")
+    col43.metric("Unidades", int(por_dia['unidades'].sum()))
+    col44.metric("Tickets", int(por_dia['tickets'].sum()))
+    st.bar_chart(por_dia, x='dia', y='importe')
+    st.dataframe(reportes.ventas_por_mes(repo.pool), hide_index=True)
+    st.dataframe(reportes.ventas_por_producto(repo.pool, desde, hasta), hide_index=True)
+if tipo_operacion == "Consultas" and opciones == "Inventario":
+    # Stock a una fecha (ultima foto + movimientos posteriores), faltantes y diferencias con el libro
+    centrar_texto("Inventario", 3, 'white')
+    fecha_stock = st.date_input("Stock al cierre del día")
+    try:
+        st.dataframe(inventario.stock_al(repo.pool, f'{fecha_stock} 23:59:59.999'), hide_index=True)
+    except ValueError as error:
+        st.warning(str(error), icon="⚠️")
+    st.caption("Faltantes detectados en conteos")
+    st.dataframe(inventario.mermas(repo.pool), hide_index=True)
+    st.caption("Diferencias entre el stock y el libro de movimientos")
+    st.dataframe(inventario.auditoria(repo.pool), hide_index=True)
+if tipo_operacion == "Consultas" and opciones == "Reposicion":
+    # Lista mantenida al vender; la cantidad sugerida sale de la venta diaria de las ultimas semanas
+    centrar_texto("Productos por reponer", 3, 'white')
+    st.dataframe(reposicion.sugerencias(repo.pool), hide_index=True)
+    st.caption("Niveles configurados")
+    st.dataframe(reposicion.niveles(repo.pool), hide_index=True)
+if tipo_operacion == "Consultas" and opciones == "Analisis":
+    # Cruces de stock, precios y ventas resueltos en SQL sobre las bases adjuntadas
+    centrar_texto("Análisis", 3, 'white')
+    col45, col46 = st.columns(2)
+    with col45:
+        desde = st.date_input("Desde", value=None)
+    with col46:
+        hasta = st.date_input("Hasta (sin incluir)", value=None)
+    valorizacion = analisis.valorizacion_stock(repo.pool)
+    st.metric("Stock valorizado a precio de compra", f"R$ {valorizacion['valor'].sum():.2f}")
+    st.caption("Margen bruto por producto")
+    st.dataframe(analisis.margen_por_producto(repo.pool, desde, hasta), hide_index=True)
+    col47, col48 = st.columns(2)
+    with col47:
+        st.caption("Más vendidos")
+        st.dataframe(analisis.mas_vendidos(repo.pool, desde, hasta), hide_index=True)
+    with col48:
+        st.caption("Menos vendidos")
+        st.dataframe(analisis.menos_vendidos(repo.pool, desde, hasta), hide_index=True)
+    st.caption("Valorización del stock")
+    st.dataframe(valorizacion, hide_index=True)
+if tipo_operacion == "Consultas" and opciones == "Historial de ventas":
+    # Ventas de la base y de los meses archivados en Parquet, filtradas por fecha
+    centrar_texto("Historial de ventas", 3, 'white')
+    col55, col56 = st.columns(2)
+    with col55:
+        desde = st.date_input("Desde", value=date.today().replace(day=1))
+    with col56:
+        hasta = st.date_input("Hasta (sin incluir)", value=None)
+    historico = archivo.leer_ventas(repo.pool, desde, hasta)
+    st.caption(f"{len(historico)} ventas")
+    st.dataframe(historico, hide_index=True)
+    meses = archivo.meses_archivados(repo.pool)
+    st.caption(f"Meses archivados: {', '.join(meses) if meses else 'ninguno'}")
+    if st.button("Archivar meses cerrados"):
+        try:
+            archivadas = archivo.archivar(repo.pool)
+        except BaseOcupada as error:
+            st.warning(str(error), icon="⚠️")
+        else:
+            st.caption(f"{sum(archivadas.values())} ventas archivadas en {len(archivadas)} meses")
+if tipo_operacion == "Consultas" and opciones == "Respaldos":
+    # La copia corre en otro hilo; las cajas pueden seguir vendiendo
+    centrar_texto("Respaldos", 3, 'white')
+    if st.button("Respaldar ahora", disabled=respaldos.en_curso):
+        respaldos.iniciar()
+    if respaldos.en_curso:
+        st.info("Respaldo en curso...")
+    elif respaldos.error is not None:
+        st.error(f"El último respaldo falló: {respaldos.error}", icon="⚠️")
+    elif respaldos.ultimo:
+        st.success(f"Último respaldo: {respaldos.ultimo}")
+    st.dataframe({'Respaldo': respaldo.respaldos(respaldos.destino)}, hide_index=True)
+
+cerrar_rerun()
@@ -0,0 +1,4 @@
+"""Benchmarks reproducibles del backend con datos sinteticos.
+
+Uso: python -m bench --filas 1000 10000 --salida bench.json
+"""
@@ -0,0 +1,61 @@
+"""python -m bench: genera datos sinteticos, corre los escenarios y guarda un JSON."""
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import tempfile
+from datetime import datetime
+
+from supermercado import Pool
+
+from .datos import poblar
+from .escenarios import correr
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description=__doc__)
+    parser.add_argument('--filas', type=int, nargs='+', default=[1000, 10000],
+                        help='cantidades de productos a probar (las ventas son 10 veces mas)')
+    parser.add_argument('--ventas-por-producto', type=int, default=10)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default='bench.json')
+    args = parser.parse_args(argv)
+
+    informe = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'corridas': [],
+    }
+    for filas in args.filas:
+        with tempfile.TemporaryDirectory() as directorio:
+            productos = poblar(directorio, filas, filas * args.ventas_por_producto, args.semilla)
+            pool = Pool(directorio)
+            try:
+                resultados = correr(pool, productos, args.repeticiones, args.semilla)
+            finally:
+                pool.cerrar()
+        informe['corridas'].append({'productos': filas, 'ventas': filas * args.ventas_por_producto,
+                                    'escenarios': resultados})
+        for nombre, estadisticas in resultados.items():
+            print(f"{filas:>8} {nombre:<24} mediana {estadisticas['mediana_ms']:>10.3f} ms"
+                  f"  p95 {estadisticas['p95_ms']:>10.3f} ms")
+
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""python -m bench.carga: sesiones de caja concurrentes contra app.py con AppTest.
+
+Cada sesion es un AppTest en su propio proceso: AppTest guarda estado
+global (el Runtime, la configuracion) y no admite varias corridas a la vez
+en hilos del mismo proceso. Es como tener una terminal por caja, cada una
+con su Pool y su Diario, compitiendo por las mismas bases. Cada sesion hace
+tickets completos: elige productos, "Agregar" varias veces, "Finalizar" y
+abre una pantalla de Consultas. Se mide cada rerun y se informan percentiles, tickets por minuto
+y tasas de error y de bloqueo para cada nivel de concurrencia.
+
+Las bases son una copia descartable: sinteticas (bench.datos) o copiadas de
+`--bases`. Los procesos trabajan en ese directorio porque app.py abre las
+bases relativas al directorio actual.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from supermercado.instrumentacion import percentil
+
+from .__main__ import commit_actual
+from .datos import poblar
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+CONSULTAS = ['Ventas', 'Stock', 'Resumen', 'Reposicion']
+
+
+def _por_etiqueta(elementos, etiqueta):
+    return next(elemento for elemento in elementos if elemento.label == etiqueta)
+
+
+class Sesion:
+    """Una caja: un AppTest que repite el flujo de venta y guarda la duracion de cada rerun."""
+
+    def __init__(self, caja, semilla, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.caja = caja
+        self.azar = random.Random(semilla)
+        self.app = AppTest.from_file(APP, default_timeout=timeout)
+        # (paso, segundos, error, bloqueo)
+        self.reruns = []
+        self.tickets = 0
+        self.errores = []
+
+    def _correr(self, paso, accion=None):
+        inicio = time.perf_counter()
+        error = None
+        try:
+            (accion or self.app.run)()
+            if self.app.exception:
+                error = self.app.exception[0].value
+        except Exception as excepcion:
+            error = repr(excepcion)
+        # Los errores de lock tambien pueden llegar como st.error en la pagina
+        mensajes = [elemento.value for elemento in self.app.error] if error is None else [error]
+        bloqueo = any('bloquead' in str(m) or 'locked' in str(m) or 'escribiendo' in str(m) for m in mensajes)
+        self.reruns.append((paso, time.perf_counter() - inicio, error is not None, bloqueo))
+        if error is not None:
+            self.errores.append(str(error).splitlines()[0][:200])
+        return error is None
+
+    def _pantalla(self, tipo, opcion):
+        # Las opciones del segundo selectbox dependen del tipo: hace falta un rerun entre los dos
+        self.app.sidebar.selectbox[0].set_value(tipo)
+        if not self._correr(tipo):
+            return False
+        self.app.sidebar.selectbox[1].set_value(opcion)
+        return self._correr(f'{tipo}/{opcion}')
+
+    def iniciar(self):
+        self._correr('inicio')
+        _por_etiqueta(self.app.sidebar.number_input, 'Caja').set_value(self.caja)
+        return self._correr('caja')
+
+    def ticket(self, items):
+        for _ in range(items):
+            producto = _por_etiqueta(self.app.selectbox, 'Elija el producto...')
+            producto.set_value(self.azar.choice(producto.options))
+            _por_etiqueta(self.app.number_input, 'Cantidad').set_value(self.azar.randint(1, 3))
+            if not self._correr('agregar', _por_etiqueta(self.app.button, 'Agregar').click().run):
+                return
+        if self._correr('finalizar', _por_etiqueta(self.app.button, 'Finalizar').click().run):
+            self.tickets += 1
+        self._pantalla('Consultas', self.azar.choice(CONSULTAS))
+        self._pantalla('Ingresos', 'Ventas')
+
+
+def _caja(caja, semilla, timeout, tickets, items, barrera, cola):
+    """Proceso de una caja: arranca la sesion, espera a las demas y hace sus tickets."""
+    sesion = Sesion(caja, semilla, timeout)
+    desde = hasta = time.time()
+    vaciado = None
+    try:
+        if not sesion.iniciar():
+            barrera.abort()
+        else:
+            anteriores = _anotados(caja)
+            barrera.wait()
+            desde = time.time()
+            for _ in range(tickets):
+                sesion.ticket(items)
+            hasta = time.time()
+            vaciado = _esperar_diario(caja, anteriores + sesion.tickets)
+    except (threading.BrokenBarrierError, StopIteration, IndexError) as error:
+        sesion.reruns.append(('abortada', 0.0, True, False))
+        sesion.errores.append(f'abortada: {error!r}')
+        barrera.abort()
+    cola.put((sesion.reruns, sesion.tickets, sesion.errores, desde, hasta, vaciado))
+
+
+def _anotados(caja):
+    con = sqlite3.connect('ventas.db')
+    try:
+        return con.execute('SELECT COUNT(*) FROM tickets_diario WHERE caja = ?', (str(caja),)).fetchone()[0]
+    finally:
+        con.close()
+
+
+def _esperar_diario(caja, esperados, timeout=60):
+    """Segundos hasta que el hilo del diario aplico `esperados` tickets de la caja (None si no termina).
+
+    El proceso no puede salir antes: el hilo del diario es daemon y los tickets quedarian sin aplicar.
+    """
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < timeout:
+        if _anotados(caja) >= esperados:
+            return round(time.perf_counter() - inicio, 2)
+        time.sleep(0.05)
+    return None
+
+
+def nivel(sesiones, tickets, items, semilla, timeout):
+    """Corre `sesiones` cajas a la vez, cada una con `tickets` tickets de `items` lineas."""
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(sesiones)
+    cola = contexto.Queue()
+    procesos = [contexto.Process(target=_caja, name=f'caja-{numero + 1}',
+                                 args=(numero + 1, semilla + numero, timeout, tickets, items, barrera, cola))
+                for numero in range(sesiones)]
+    for proceso in procesos:
+        proceso.start()
+    cajas = [cola.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+
+    reruns = [rerun for caja in cajas for rerun in caja[0] if rerun[0] not in ('inicio', 'caja')]
+    tiempos = [rerun[1] * 1000 for rerun in reruns] or [0.0]
+    por_paso = {}
+    for paso, duracion, _, _ in reruns:
+        por_paso.setdefault(paso, []).append(duracion * 1000)
+    emitidos = sum(caja[1] for caja in cajas)
+    errores = Counter(error for caja in cajas for error in caja[2])
+    segundos = max(caja[4] for caja in cajas) - min(caja[3] for caja in cajas)
+    vaciados = [caja[5] for caja in cajas]
+    return {
+        'sesiones': sesiones,
+        'reruns': len(reruns),
+        'segundos': round(segundos, 2),
+        'p50_ms': round(percentil(tiempos, 0.50), 1),
+        'p95_ms': round(percentil(tiempos, 0.95), 1),
+        'p99_ms': round(percentil(tiempos, 0.99), 1),
+        'p95_por_paso_ms': {paso: round(percentil(valores, 0.95), 1) for paso, valores in por_paso.items()},
+        'tickets': emitidos,
+        'tickets_por_minuto': round(emitidos / segundos * 60, 1) if segundos > 0 else 0,
+        'errores_pct': round(100 * sum(rerun[2] for rerun in reruns) / max(len(reruns), 1), 2),
+        'bloqueos_pct': round(100 * sum(rerun[3] for rerun in reruns) / max(len(reruns), 1), 2),
+        # Desde el ultimo "Finalizar" de cada caja hasta que su diario quedo aplicado
+        'vaciado_diarios_s': None if None in vaciados else max(vaciados, default=0),
+        'errores': dict(errores.most_common(10)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.carga', description=__doc__)
+    parser.add_argument('--sesiones', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='niveles de concurrencia a probar, en orden')
+    parser.add_argument('--tickets', type=int, default=5, help='tickets por sesion en cada nivel')
+    parser.add_argument('--items', type=int, default=3, help='"Agregar" por ticket')
+    parser.add_argument('--productos', type=int, default=1000, help='productos de las bases sinteticas')
+    parser.add_argument('--bases', help='carpeta con stock.db, precios.db y ventas.db a copiar en vez de generar')
+    parser.add_argument('--timeout', type=float, default=30, help='segundos maximos por rerun')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default='carga.json')
+    args = parser.parse_args(argv)
+    salida = os.path.abspath(args.salida)
+
+    informe = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'tickets_por_sesion': args.tickets,
+        'items_por_ticket': args.items,
+        'niveles': [],
+    }
+    anterior = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        if args.bases:
+            for base in ('stock', 'precios', 'ventas'):
+                shutil.copy(os.path.join(args.bases, f'{base}.db'), directorio)
+        else:
+            poblar(directorio, args.productos, args.productos * 10, args.semilla)
+        os.chdir(directorio)
+        try:
+            print(f"{'sesiones':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'tickets/min':>12} "
+                  f"{'errores %':>10} {'bloqueos %':>11}")
+            for sesiones in args.sesiones:
+                resultado = nivel(sesiones, args.tickets, args.items, args.semilla, args.timeout)
+                informe['niveles'].append(resultado)
+                print(f"{sesiones:>8} {resultado['p50_ms']:>8.1f} {resultado['p95_ms']:>8.1f} "
+                      f"{resultado['p99_ms']:>8.1f} {resultado['tickets_por_minuto']:>12.1f} "
+                      f"{resultado['errores_pct']:>10.2f} {resultado['bloqueos_pct']:>11.2f}")
+        finally:
+            os.chdir(anterior)
+
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
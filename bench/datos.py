@@ -0,0 +1,73 @@
+"""Generador de datos sinteticos de un supermercado (stock, precios y ventas)."""
+import random
+from datetime import datetime, timedelta
+
+from supermercado import Pool, inventario, migrar
+
+CATEGORIAS = ['Arroz', 'Feijão', 'Açucar', 'Farinha', 'Leite', 'Café', 'Óleo', 'Macarrão', 'Biscoito',
+              'Sabão', 'Detergente', 'Papel Higiênico', 'Refrigerante', 'Cerveja', 'Suco', 'Iogurte',
+              'Queijo', 'Presunto', 'Margarina', 'Sal', 'Molho de Tomate', 'Sardinha', 'Milho', 'Ervilha']
+VARIANTES = ['Branco', 'Integral', 'Tradicional', 'Light', 'Zero', 'Premium', 'Extra', 'Especial',
+             'Orgânico', 'Caseiro', 'Tipo 1', 'Parboilizado', 'Desnatado', 'Morango', 'Chocolate']
+MARCAS = ['Copacol', 'Gramado', 'Zaelli', 'Venturi', 'Camil', 'Tio João', 'Nestlé', 'Italac', 'Pilão',
+          'Liza', 'Renata', 'Piracanjuba', 'Ypê', 'Neve', 'Coca-Cola', 'Skol', 'Del Valle', 'Sadia',
+          'Qualy', 'Cisne', 'Pomarola', 'Gomes da Costa', 'Quero', 'Vigor']
+MEDIDAS = ['200 g', '500 grs', '1 kg', '2 kg', '5 kg', '1 L', '2 L', '350 ml', '12 un', '4 un']
+
+
+def nombres(cantidad, semilla=0):
+    """`cantidad` nombres de producto distintos."""
+    azar = random.Random(semilla)
+    vistos = set()
+    while len(vistos) < cantidad:
+        nombre = ' '.join([azar.choice(CATEGORIAS), azar.choice(VARIANTES), azar.choice(MARCAS),
+                           azar.choice(MEDIDAS)])
+        if nombre in vistos:
+            nombre = f'{nombre} #{len(vistos)}'
+        vistos.add(nombre)
+    return sorted(vistos, key=lambda _: azar.random())
+
+
+def poblar(directorio, productos, ventas, semilla=0):
+    """Crea las tres bases en `directorio` con `productos` SKUs y `ventas` lineas de venta.
+
+    La popularidad de los productos sigue una distribucion de Zipf, como en
+    una tienda real donde pocos productos concentran la mayoria de las ventas.
+    """
+    azar = random.Random(semilla)
+    pool = Pool(directorio)
+    migrar(pool)
+    lista = nombres(productos, semilla)
+    compras = [round(azar.uniform(1, 60), 2) for _ in lista]
+
+    with pool.transaccion('stock') as con:
+        con.executemany('INSERT INTO stock (codigo, producto, cantidad) VALUES (?, ?, ?)',
+                        ((i + 1, nombre, 10 ** 6) for i, nombre in enumerate(lista)))
+        con.executemany('INSERT INTO precios.precios (codigo, producto, precio_compra, precio_venta) '
+                        'VALUES (?, ?, ?, ?)',
+                        ((i + 1, nombre, compra, round(compra * azar.uniform(1.1, 1.6), 2))
+                         for i, (nombre, compra) in enumerate(zip(lista, compras))))
+
+    # Foto inicial del stock para el libro de movimientos
+    inventario.tomar_snapshot(pool)
+
+    pesos = [1 / (rango + 1) for rango in range(productos)]
+    inicio = datetime.now() - timedelta(days=365)
+    # Los precios rigen desde antes de la primera venta generada
+    with pool.transaccion('precios') as con:
+        con.execute('UPDATE historial_precios SET valid_from = ?', (inicio.strftime('%Y-%m-%d %H:%M:%S'),))
+
+    def filas():
+        elegidos = azar.choices(range(productos), weights=pesos, k=ventas)
+        for i, indice in enumerate(elegidos):
+            fecha = inicio + timedelta(seconds=int(365 * 86400 * i / max(ventas, 1)))
+            cantidad = azar.randint(1, 5)
+            precio = round(compras[indice] * 1.3, 2)
+            yield (indice + 1, lista[indice], cantidad, fecha.strftime('%Y-%m-%d %H:%M:%S'),
+                   f't{i // 8}', precio, round(precio * cantidad, 2))
+
+    with pool.transaccion('ventas') as con:
+        con.executemany('INSERT INTO ventas (codigo, producto, cantidad, fecha, id_ticket, precio_unitario, '
+                        'subtotal) VALUES (?, ?, ?, ?, ?, ?, ?)', filas())
+    pool.cerrar()
+    return lista
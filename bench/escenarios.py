@@ -0,0 +1,73 @@
+"""Escenarios medidos: los caminos calientes de la aplicacion."""
+import io
+import random
+import statistics
+import time
+
+from supermercado import Catalogo, Diario, Repositorio, analisis, consultas, finalizar_venta, importacion
+from supermercado.busqueda import buscar_productos
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta `funcion` y devuelve estadisticas de tiempo en milisegundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'repeticiones': repeticiones,
+        'min_ms': round(tiempos[0], 3),
+        'mediana_ms': round(statistics.median(tiempos), 3),
+        'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+        'max_ms': round(tiempos[-1], 3),
+    }
+
+
+def correr(pool, productos, repeticiones=20, semilla=0):
+    """Corre todos los escenarios sobre `pool` y devuelve {escenario: estadisticas}."""
+    azar = random.Random(semilla)
+    repo = Repositorio(pool)
+    resultados = {}
+
+    # Lista del selectbox de ventas: recarga en frio y lectura con el catalogo vigente
+    def catalogo_frio():
+        catalogo = Catalogo(pool)
+        catalogo.vigente()
+        catalogo.cerrar()
+    resultados['catalogo_frio'] = medir(catalogo_frio, max(1, repeticiones // 4))
+    repo.productos()
+    resultados['catalogo_cacheado'] = medir(repo.productos, repeticiones)
+
+    resultados['precio_producto'] = medir(lambda: repo.precios_de(azar.choice(productos)), repeticiones)
+    resultados['busqueda'] = medir(
+        lambda: buscar_productos(pool, azar.choice(productos).split()[0]), repeticiones)
+
+    for tamanho in (1, 10, 40):
+        resultados[f'finalizar_{tamanho}_items'] = medir(
+            lambda: finalizar_venta(pool, [(azar.choice(productos), 1, 1.0) for _ in range(tamanho)]),
+            repeticiones)
+
+    # "Finalizar" con diario: solo la escritura local; el lote se aplica aparte
+    diario = Diario(pool, 'bench')
+    resultados['anotar_10_items'] = medir(
+        lambda: diario.anotar([(azar.choice(productos), 1, 1.0) for _ in range(10)]), repeticiones)
+    resultados['aplicar_lote_diario'] = medir(diario.aplicar_lote, max(1, repeticiones // diario.lote))
+
+    for base in ('stock', 'precios', 'ventas'):
+        resultados[f'consulta_{base}'] = medir(lambda: consultas.pagina(pool, base), repeticiones)
+
+    resultados['ingreso_producto'] = medir(
+        lambda: repo.sumar_cantidad(azar.choice(productos), 1), repeticiones)
+
+    def importar_entrega():
+        lineas = ['producto,cantidad'] + [f'{p},1' for p in azar.sample(productos, min(1000, len(productos)))]
+        importacion.importar(pool, io.StringIO('\n'.join(lineas)), 'entrega.csv')
+    resultados['importar_1000_lineas'] = medir(importar_entrega, max(1, repeticiones // 4))
+
+    # Analisis sobre las tres bases adjuntadas
+    resultados['margen_por_producto'] = medir(lambda: analisis.margen_por_producto(pool), max(1, repeticiones // 4))
+    resultados['mas_vendidos'] = medir(lambda: analisis.mas_vendidos(pool), repeticiones)
+    resultados['valorizacion_stock'] = medir(lambda: analisis.valorizacion_stock(pool), repeticiones)
+    return resultados
@@ -0,0 +1,12 @@
+"""Backend del supermercado: acceso a las bases stock, precios y ventas."""
+from .caja import ResultadoVenta, finalizar_venta
+from .carrito import Carrito
+from .catalogo import Catalogo, Instantanea
+from .conexion import BASES, BaseOcupada, Pool
+from .diario import Diario
+from .esquema import migrar
+from .instrumentacion import Registro
+from .repositorio import Repositorio, abrir
+
+__all__ = ['BASES', 'BaseOcupada', 'Carrito', 'Catalogo', 'Diario', 'Instantanea', 'Pool', 'Registro', 'Repositorio',
+           'ResultadoVenta', 'abrir', 'finalizar_venta', 'migrar']
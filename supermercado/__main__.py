@@ -0,0 +1,101 @@
+"""python -m supermercado: tareas por lotes sobre las bases, sin Streamlit.
+
+Cada comando importa solo lo que usa (pandas recien al importar archivos o
+archivar), asi el arranque es rapido.
+"""
+import argparse
+import sys
+
+from .conexion import BaseOcupada
+from .repositorio import abrir
+
+
+def cierre(repo, args):
+    """Cierre del dia: aplica los diarios de las cajas, toma la foto del stock y respalda."""
+    from . import diario, inventario
+
+    for caja in diario.cajas(repo.pool):
+        aplicados = diario.Diario(repo.pool, caja).aplicar_pendientes()
+        print(f'Caja {caja}: {aplicados} tickets aplicados')
+    print(f'Foto de stock {inventario.tomar_snapshot(repo.pool)}')
+    if args.archivar:
+        archivar(repo, args)
+    if not args.sin_respaldo:
+        respaldar(repo, args)
+
+
+def importar(repo, args):
+    from . import importacion
+
+    with open(args.archivo, 'rb') as archivo:
+        resumen = importacion.importar(repo.pool, archivo, args.archivo, args.tamanho)
+    print(f'Productos nuevos: {resumen.insertados}  sumados: {resumen.actualizados}  '
+          f'precios: {resumen.precios}  rechazados: {len(resumen.rechazados)}')
+    if not resumen.rechazados.empty:
+        print(resumen.rechazados.to_string(index=False))
+
+
+def archivar(repo, args):
+    from . import archivo
+
+    archivadas = archivo.archivar(repo.pool, getattr(args, 'hasta', None))
+    for mes, filas in archivadas.items():
+        print(f'{mes}: {filas} ventas archivadas')
+    if not archivadas:
+        print('No hay meses cerrados para archivar')
+
+
+def respaldar(repo, args):
+    from . import respaldo
+
+    ruta = respaldo.respaldar(repo.pool)
+    respaldo.rotar(respaldo.carpeta(repo.pool))
+    print(f'Respaldo en {ruta}')
+
+
+def migrar(repo, args):
+    # abrir() ya aplico las migraciones pendientes
+    print('Bases al dia')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m supermercado', description=__doc__)
+    parser.add_argument('-d', '--directorio', default='.', help='carpeta con stock.db, precios.db y ventas.db')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comando = comandos.add_parser('cierre', help=cierre.__doc__)
+    comando.add_argument('--archivar', action='store_true', help='archiva tambien los meses cerrados')
+    comando.add_argument('--sin-respaldo', action='store_true')
+    comando.set_defaults(funcion=cierre)
+
+    comando = comandos.add_parser('importar', help='importa mercaderia o una lista de precios (CSV o XLSX)')
+    comando.add_argument('archivo')
+    comando.add_argument('--tamanho', type=int, default=5000, help='filas por bloque')
+    comando.set_defaults(funcion=importar)
+
+    comando = comandos.add_parser('archivar', help='pasa las ventas de meses cerrados a Parquet')
+    comando.add_argument('--hasta', help="primer mes que no se archiva ('AAAA-MM'), por defecto el actual")
+    comando.set_defaults(funcion=archivar)
+
+    comandos.add_parser('respaldar', help='copia las tres bases a respaldos/').set_defaults(funcion=respaldar)
+    comandos.add_parser('migrar', help='aplica las migraciones pendientes').set_defaults(funcion=migrar)
+
+    args = parser.parse_args(argv)
+    try:
+        repo = abrir(args.directorio)
+    except (BaseOcupada, OSError) as error:
+        print(f'Error: {error}', file=sys.stderr)
+        return 1
+    try:
+        args.funcion(repo, args)
+    except (BaseOcupada, ValueError, OSError) as error:
+        print(f'Error: {error}', file=sys.stderr)
+        return 1
+    finally:
+        repo.catalogo.cerrar()
+        repo.pool.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Analisis que cruzan stock, precios y ventas en SQL.
+
+La conexion de stock del pool tiene adjuntadas (ATTACH) las bases de ventas
+y precios, asi que los cruces se hacen con un JOIN por `codigo` dentro de
+SQLite y a Python solo llega el resultado agregado. Las ventas por producto
+salen de `resumen_producto_dia`; el margen necesita el costo de cada linea y
+lee `ventas` por el indice (codigo, fecha), con el precio de compra que regia
+al momento de la venta; los meses ya archivados se leen del Parquet.
+"""
+from .conexion import fecha_sql, leer_sql
+
+
+def _rango(columna, desde, hasta):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append(f'{columna} >= ?')
+        parametros.append(fecha_sql(desde))
+    if hasta is not None:
+        condiciones.append(f'{columna} < ?')
+        parametros.append(fecha_sql(hasta))
+    return condiciones, parametros
+
+
+def _consulta(pool, sql, parametros=()):
+    with pool.conexion('stock') as con:
+        return leer_sql(con, sql, parametros)
+
+
+def margen_por_producto(pool, desde=None, hasta=None):
+    """Unidades, importe, costo, margen y margen % por producto, de mayor a menor margen.
+
+    El costo de cada linea es el precio de compra vigente cuando se vendio. Se
+    recorre cada periodo del historial de precios y se suman sus ventas por el
+    indice (codigo, fecha); los meses archivados en Parquet (ver `archivo`) se
+    cruzan con el historial en pandas y se suman por producto. Las ventas sin
+    fecha o sin precio vigente no se cuentan.
+    """
+    condiciones, parametros = _rango('v.fecha', desde, hasta)
+    filtro = ''.join(f' AND {condicion}' for condicion in condiciones)
+    # CROSS JOIN fija el orden: historial afuera, ventas por rango del indice adentro
+    totales = _consulta(pool, f'''
+        SELECT h.codigo, SUM(v.cantidad) AS unidades, SUM(v.subtotal) AS importe,
+               SUM(v.cantidad * h.precio_compra) AS costo
+        FROM precios.historial_precios h
+        CROSS JOIN ventas.ventas v
+                ON v.codigo = h.codigo AND v.fecha >= h.valid_from
+               AND v.fecha < COALESCE(h.valid_to, '9999'){filtro}
+        GROUP BY h.codigo''', parametros)
+    archivados = _margen_archivado(pool, desde, hasta)
+    if not archivados.empty:
+        import pandas as pd
+        totales = pd.concat([totales, archivados], ignore_index=True).groupby('codigo', as_index=False).sum()
+    with pool.conexion('stock') as con:
+        productos = dict(con.execute('SELECT codigo, producto FROM stock'))
+    totales.insert(1, 'producto', totales['codigo'].map(productos))
+    totales['margen'] = (totales['importe'] - totales['costo']).round(2)
+    totales['margen_pct'] = (totales['margen'] * 100 / totales['importe'].where(totales['importe'] != 0)).round(2)
+    totales[['importe', 'costo']] = totales[['importe', 'costo']].round(2)
+    return totales.sort_values('margen', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _margen_archivado(pool, desde, hasta):
+    """Unidades, importe y costo por producto de las ventas archivadas del rango."""
+    from . import archivo
+    rango = [None if fecha is None else fecha_sql(fecha) for fecha in (desde, hasta)]
+    ventas = archivo.leer_archivadas(pool, *rango, columnas=['codigo', 'cantidad', 'subtotal', 'fecha'])
+    ventas = ventas.dropna(subset=['codigo', 'fecha'])
+    if ventas.empty:
+        return ventas[['codigo']].assign(unidades=0, importe=0.0, costo=0.0)
+    with pool.conexion('precios') as con:
+        historial = leer_sql(con, '''SELECT codigo, precio_compra, valid_from, COALESCE(valid_to, '9999') AS valid_to
+                                     FROM historial_precios''')
+    lineas = ventas.astype({'codigo': 'int64'}).merge(historial, on='codigo')
+    lineas = lineas[(lineas['fecha'] >= lineas['valid_from']) & (lineas['fecha'] < lineas['valid_to'])]
+    lineas = lineas.assign(costo=lineas['cantidad'] * lineas['precio_compra'])
+    return (lineas.groupby('codigo', as_index=False)
+            .agg(unidades=('cantidad', 'sum'), importe=('subtotal', 'sum'), costo=('costo', 'sum')))
+
+
+def _ranking(pool, desde, hasta, limite, orden):
+    condiciones, parametros = _rango('r.dia', desde and str(desde)[:10], hasta and str(hasta)[:10])
+    filtro = ''.join(f' AND {condicion}' for condicion in condiciones)
+    # Desde stock con LEFT JOIN: los productos sin ventas en el rango aparecen con cero
+    return _consulta(pool, f'''
+        SELECT s.codigo, s.producto, s.cantidad AS stock,
+               COALESCE(SUM(r.unidades), 0) AS unidades, ROUND(COALESCE(SUM(r.importe), 0), 2) AS importe
+        FROM main.stock s
+        LEFT JOIN ventas.resumen_producto_dia r ON r.codigo = s.codigo{filtro}
+        GROUP BY s.codigo
+        ORDER BY unidades {orden}, importe {orden}, s.producto
+        LIMIT ?''', parametros + [limite])
+
+
+def mas_vendidos(pool, desde=None, hasta=None, limite=10):
+    """Productos con mas unidades vendidas entre los dias `desde` (incluido) y `hasta` (excluido)."""
+    return _ranking(pool, desde, hasta, limite, 'DESC')
+
+
+def menos_vendidos(pool, desde=None, hasta=None, limite=10):
+    """Productos con menos unidades vendidas en el rango, incluidos los que no vendieron nada."""
+    return _ranking(pool, desde, hasta, limite, 'ASC')
+
+
+def sin_ventas(pool, desde):
+    """Stock inmovilizado: productos con stock y sin ventas desde el dia `desde`, valorizados a precio de compra."""
+    return _consulta(pool, '''
+        SELECT s.codigo, s.producto, s.cantidad, p.precio_compra, ROUND(s.cantidad * p.precio_compra, 2) AS valor,
+               (SELECT MAX(r.dia) FROM ventas.resumen_producto_dia r WHERE r.codigo = s.codigo) AS ultima_venta
+        FROM main.stock s
+        LEFT JOIN precios.precios p ON p.codigo = s.codigo
+        WHERE s.cantidad > 0 AND NOT EXISTS
+              (SELECT 1 FROM ventas.resumen_producto_dia r WHERE r.codigo = s.codigo AND r.dia >= ?)
+        ORDER BY valor DESC''', (str(desde)[:10],))
+
+
+def valorizacion_stock(pool):
+    """Cantidad, precio de compra vigente y valor de cada producto; sin precio el valor queda vacio."""
+    return _consulta(pool, '''
+        SELECT s.codigo, s.producto, s.cantidad, p.precio_compra,
+               ROUND(s.cantidad * p.precio_compra, 2) AS valor
+        FROM main.stock s
+        LEFT JOIN precios.precios p ON p.codigo = s.codigo
+        ORDER BY valor DESC''')
@@ -0,0 +1,151 @@
+"""Archivo de ventas de meses cerrados en Parquet.
+
+`archivar` copia cada mes cerrado de la tabla ventas a un archivo Parquet
+comprimido (`ventas-AAAA-MM.parquet`), lo borra de la base y compacta el
+archivo con VACUUM, asi la tabla viva solo tiene los meses recientes. Los
+reportes no cambian: las tablas de resumen no se tocan al borrar ventas.
+
+`leer_ventas` junta las ventas vivas y las archivadas de un rango de fechas,
+abriendo solo los archivos de los meses que el rango necesita;
+`leer_archivadas` devuelve solo la parte archivada.
+"""
+import glob
+import os
+import sqlite3
+from datetime import date
+
+import pandas as pd
+
+from .conexion import leer_sql
+
+CARPETA = 'archivo'
+COLUMNAS = ['id_venta', 'codigo', 'producto', 'cantidad', 'fecha', 'id_ticket', 'precio_unitario', 'subtotal']
+COMPRESION = 'zstd'
+
+
+def carpeta(pool):
+    return os.path.join(pool.directorio, CARPETA)
+
+
+def _ruta(pool, mes):
+    return os.path.join(carpeta(pool), f'ventas-{mes}.parquet')
+
+
+def _mes_siguiente(mes):
+    anho, numero = int(mes[:4]), int(mes[5:7])
+    return f'{anho + numero // 12:04d}-{numero % 12 + 1:02d}'
+
+
+def meses_archivados(pool):
+    """Meses ('AAAA-MM') que tienen archivo, ordenados."""
+    prefijo = len('ventas-')
+    return sorted(os.path.basename(ruta)[prefijo:prefijo + 7]
+                  for ruta in glob.glob(os.path.join(carpeta(pool), 'ventas-*.parquet')))
+
+
+def archivar(pool, hasta=None):
+    """Archiva los meses anteriores a `hasta` ('AAAA-MM', por defecto el mes actual).
+
+    Devuelve {mes: filas archivadas}. Cada mes se escribe antes de borrarse de
+    la base; si el proceso se corta en el medio, volver a correrlo completa el
+    archivo sin duplicar ventas (se une por id_venta). Solo se borran las
+    ventas que se escribieron: un ticket del mes que llega tarde (por ejemplo
+    desde el diario de una caja atrasada) queda en la base para el proximo
+    archivado.
+    """
+    hasta = hasta or date.today().strftime('%Y-%m')
+    with pool.conexion('ventas') as con:
+        meses = [fila[0] for fila in con.execute(
+            '''SELECT DISTINCT substr(fecha, 1, 7) FROM ventas
+               WHERE fecha IS NOT NULL AND fecha < ? ORDER BY 1''', (f'{hasta}-01',))]
+    archivadas = {}
+    os.makedirs(carpeta(pool), exist_ok=True)
+    for mes in meses:
+        rango = (f'{mes}-01', f'{_mes_siguiente(mes)}-01')
+        with pool.conexion('ventas') as con:
+            ventas = leer_sql(con, f'SELECT {", ".join(COLUMNAS)} FROM ventas WHERE fecha >= ? AND fecha < ?',
+                              rango)
+        if ventas.empty:
+            continue
+        # id_venta es AUTOINCREMENT: lo que se confirme despues de la lectura tiene ids mayores
+        ultimo = int(ventas['id_venta'].max())
+        ruta = _ruta(pool, mes)
+        if os.path.exists(ruta):
+            ventas = pd.concat([pd.read_parquet(ruta), ventas], ignore_index=True)
+            ventas = ventas.drop_duplicates('id_venta', keep='last')
+        # Se escribe a un temporal y se renombra: un archivo a medio escribir nunca queda como el del mes
+        temporal = ruta + '.tmp'
+        ventas.sort_values(['fecha', 'id_venta']).to_parquet(temporal, compression=COMPRESION, index=False)
+        os.replace(temporal, ruta)
+        with pool.transaccion('ventas') as con:
+            archivadas[mes] = con.execute('DELETE FROM ventas WHERE fecha >= ? AND fecha < ? AND id_venta <= ?',
+                                          rango + (ultimo,)).rowcount
+    if archivadas:
+        with pool.conexion('ventas') as con:
+            try:
+                con.execute('VACUUM')
+            except sqlite3.OperationalError:
+                # Base en uso: las ventas ya se borraron, el espacio se recupera en el proximo archivado
+                pass
+    return archivadas
+
+
+def _archivadas(pool, desde, hasta, columnas):
+    """DataFrames de los archivos de los meses que se cruzan con [desde, hasta) (textos o None)."""
+    filtros = []
+    if desde is not None:
+        filtros.append(('fecha', '>=', desde))
+    if hasta is not None:
+        filtros.append(('fecha', '<', hasta))
+    partes = []
+    for mes in meses_archivados(pool):
+        if (desde is None or f'{_mes_siguiente(mes)}-01' > desde) and (hasta is None or f'{mes}-01' < hasta):
+            partes.append(pd.read_parquet(_ruta(pool, mes), columns=columnas, filters=filtros or None))
+    return partes
+
+
+def leer_archivadas(pool, desde=None, hasta=None, columnas=None):
+    """Solo las ventas archivadas con fecha en [desde, hasta), sin las que siguen en la base.
+
+    Una venta puede estar en los dos lados si un archivado se corto antes de borrarla.
+    """
+    columnas = list(columnas or COLUMNAS)
+    desde = None if desde is None else str(desde)
+    hasta = None if hasta is None else str(hasta)
+    lectura = columnas + ['id_venta'] * ('id_venta' not in columnas)
+    partes = [parte for parte in _archivadas(pool, desde, hasta, lectura) if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    ventas = pd.concat(partes, ignore_index=True).drop_duplicates('id_venta')
+    with pool.conexion('ventas') as con:
+        vivas = {fila[0] for fila in con.execute('SELECT id_venta FROM ventas WHERE id_venta <= ?',
+                                                 (int(ventas['id_venta'].max()),))}
+    return ventas[~ventas['id_venta'].isin(vivas)][columnas].reset_index(drop=True)
+
+
+def leer_ventas(pool, desde=None, hasta=None, columnas=None):
+    """Ventas con fecha en [desde, hasta) de la base y del archivo, ordenadas por fecha."""
+    columnas = list(columnas or COLUMNAS)
+    desde = None if desde is None else str(desde)
+    hasta = None if hasta is None else str(hasta)
+    # fecha para ordenar e id_venta para no repetir ventas de un archivado interrumpido
+    lectura = columnas + [columna for columna in ('fecha', 'id_venta') if columna not in columnas]
+    partes = _archivadas(pool, desde, hasta, lectura)
+
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append('fecha >= ?')
+        parametros.append(desde)
+    if hasta is not None:
+        condiciones.append('fecha < ?')
+        parametros.append(hasta)
+    where = ' WHERE ' + ' AND '.join(condiciones) if condiciones else ''
+    with pool.conexion('ventas') as con:
+        partes.append(leer_sql(con, f'SELECT {", ".join(lectura)} FROM ventas{where}', parametros))
+
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    ventas = pd.concat(partes, ignore_index=True)
+    ventas = ventas.drop_duplicates('id_venta')
+    return ventas.sort_values('fecha', kind='stable', na_position='first')[columnas].reset_index(drop=True)
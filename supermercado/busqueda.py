@@ -0,0 +1,46 @@
+"""Busqueda incremental de productos para el formulario de ventas.
+
+Usa el indice FTS5 de trigramas `stock_fts` (creado por la migracion 3 de
+stock), de modo que cada consulta devuelve solo los primeros resultados sin
+recorrer la tabla. Un texto formado solo por digitos se toma como codigo.
+"""
+TRIGRAMA = 3
+
+
+def producto_por_codigo(pool, codigo):
+    """Devuelve (codigo, producto) o None."""
+    with pool.conexion('stock') as con:
+        return con.execute('SELECT codigo, producto FROM main.stock WHERE codigo = ?',
+                           (int(codigo),)).fetchone()
+
+
+def buscar_productos(pool, texto, limite=20):
+    """Lista de (codigo, producto) que contienen todas las palabras de `texto`."""
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    if texto.isdigit():
+        encontrado = producto_por_codigo(pool, texto)
+        return [encontrado] if encontrado else []
+
+    palabras = texto.split()
+    # El indice de trigramas solo sirve para palabras de 3 o mas letras; las
+    # mas cortas se filtran con LIKE sobre las filas ya encontradas
+    largas = [p for p in palabras if len(p) >= TRIGRAMA]
+    cortas = [p for p in palabras if len(p) < TRIGRAMA]
+    filtros = ''.join(' AND s.producto LIKE ?' for _ in cortas)
+    parametros_cortas = [f'%{p}%' for p in cortas]
+
+    with pool.conexion('stock') as con:
+        if largas:
+            consulta = ' AND '.join('"' + p.replace('"', '""') + '"' for p in largas)
+            return con.execute(
+                f'''SELECT s.codigo, s.producto FROM main.stock_fts f
+                    JOIN main.stock s ON s.codigo = f.rowid
+                    WHERE stock_fts MATCH ?{filtros}
+                    ORDER BY f.rank LIMIT ?''',
+                [consulta] + parametros_cortas + [limite]).fetchall()
+        return con.execute(
+            f'''SELECT s.codigo, s.producto FROM main.stock s
+                WHERE 1{filtros} ORDER BY s.producto LIMIT ?''',
+            parametros_cortas + [limite]).fetchall()
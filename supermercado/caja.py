@@ -0,0 +1,86 @@
+"""Cierre de una venta ("Finalizar"): todo el carrito en una sola transaccion."""
+import uuid
+from dataclasses import dataclass, field
+
+from . import inventario, reposicion
+from .conexion import fecha_sql
+
+
+@dataclass
+class ResultadoVenta:
+    """Lineas registradas y rechazadas (producto, cantidad, motivo) de una venta.
+
+    `alertas` son los (producto, cantidad) vendidos que quedaron por reponer.
+    """
+    id_ticket: str = None
+    registradas: list = field(default_factory=list)
+    rechazadas: list = field(default_factory=list)
+    alertas: list = field(default_factory=list)
+
+
+def finalizar_venta(pool, lineas, fecha=None, id_ticket=None):
+    """Registra las ventas y descuenta el stock de todas las lineas a la vez.
+
+    `lineas` es una secuencia de (producto, cantidad, precio_unitario); cada
+    linea se guarda con la fecha, el id de ticket y el precio cobrados. Se usa la conexion de
+    stock, que tiene adjuntada la base de ventas, para que las inserciones y
+    los descuentos se confirmen o se deshagan juntos. Las lineas de productos
+    inexistentes o sin stock suficiente no se registran y se devuelven en
+    `rechazadas`.
+    """
+    fecha = fecha_sql(fecha)
+    if not lineas:
+        return ResultadoVenta(id_ticket or uuid.uuid4().hex)
+    with pool.transaccion('stock') as con:
+        return registrar_ticket(con, lineas, fecha, id_ticket)
+
+
+def registrar_ticket(con, lineas, fecha, id_ticket=None):
+    """Cuerpo de `finalizar_venta` sobre una transaccion de stock ya abierta; `fecha` es texto."""
+    lineas = [(producto, int(cantidad), float(precio)) for producto, cantidad, precio in lineas]
+    resultado = ResultadoVenta(id_ticket or uuid.uuid4().hex)
+    if not lineas:
+        return resultado
+
+    # Una sola consulta para todos los productos del carrito
+    nombres = sorted({producto for producto, _, _ in lineas})
+    marcas = ', '.join('?' * len(nombres))
+    existentes = {
+        producto: [codigo, cantidad]
+        for codigo, producto, cantidad in con.execute(
+            f'SELECT codigo, producto, cantidad FROM stock WHERE producto IN ({marcas})', nombres)
+    }
+
+    ventas = []
+    descuentos = {}
+    for producto, cantidad, precio in lineas:
+        if producto not in existentes:
+            resultado.rechazadas.append((producto, cantidad, 'no existe en el stock'))
+            continue
+        codigo, disponible = existentes[producto]
+        if disponible < cantidad:
+            resultado.rechazadas.append(
+                (producto, cantidad, f'stock insuficiente ({disponible})'))
+            continue
+        existentes[producto][1] = disponible - cantidad
+        descuentos[codigo] = descuentos.get(codigo, 0) + cantidad
+        ventas.append((codigo, producto, cantidad, fecha, resultado.id_ticket,
+                       precio, round(precio * cantidad, 2)))
+        resultado.registradas.append((producto, cantidad))
+
+    if not ventas:
+        return resultado
+    con.executemany('INSERT INTO ventas.ventas (codigo, producto, cantidad, fecha, id_ticket, '
+                    'precio_unitario, subtotal) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ventas)
+    cursor = con.executemany(
+        'UPDATE stock SET cantidad = cantidad - ? WHERE codigo = ? AND cantidad >= ?',
+        [(cantidad, codigo, cantidad) for codigo, cantidad in descuentos.items()])
+    if cursor.rowcount != len(descuentos):
+        # No deberia pasar dentro de BEGIN IMMEDIATE; se deshace todo el carrito
+        raise RuntimeError('El stock cambio durante el cierre de la venta')
+    inventario.registrar(con, [(codigo, -cantidad) for codigo, cantidad in descuentos.items()],
+                         'venta', resultado.id_ticket, fecha)
+    # Los triggers de stock ya actualizaron alertas_stock con los descuentos
+    resultado.alertas = reposicion.en_alerta(con, descuentos)
+    return resultado
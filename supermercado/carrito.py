@@ -0,0 +1,80 @@
+"""Carrito de la venta en curso, guardado en la sesion de Streamlit.
+
+Agregar, cancelar y leer el total son O(1): las lineas se indexan por
+producto (un producto repetido suma cantidad en su linea) y el total se
+mantiene acumulado. El DataFrame para `st.data_editor` se arma solo cuando
+se pide y se reutiliza mientras el carrito no cambie.
+"""
+COLUMNAS = ['Producto', 'Cantidad', 'Precio', 'Subtotal', 'Status']
+
+
+class Carrito:
+
+    def __init__(self):
+        # producto -> [cantidad, precio, cancelada]; el dict conserva el orden de carga
+        self._lineas = {}
+        self.total = 0.0
+        self._version = 0
+        self._tabla = None
+        self._version_tabla = -1
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def _cambio(self):
+        self._version += 1
+
+    def agregar(self, producto, cantidad, precio):
+        """Suma `cantidad` a la linea del producto (o la crea) al precio indicado."""
+        linea = self._lineas.get(producto)
+        if linea is None:
+            self._lineas[producto] = [cantidad, precio, False]
+            self.total += cantidad * precio
+        else:
+            anterior = linea[0] * linea[1]
+            linea[0] += cantidad
+            linea[1] = precio
+            if not linea[2]:
+                self.total += linea[0] * linea[1] - anterior
+        self._cambio()
+
+    def cancelar(self, producto, cancelada=True):
+        """Marca (o desmarca) la linea como cancelada; no se cobra ni descuenta stock."""
+        linea = self._lineas[producto]
+        if linea[2] == cancelada:
+            return
+        linea[2] = cancelada
+        self.total += (-1 if cancelada else 1) * linea[0] * linea[1]
+        self._cambio()
+
+    def aplicar_cancelaciones(self, estados):
+        """Aplica la columna Status editada en la tabla (mismo orden que las lineas)."""
+        for producto, cancelada in zip(list(self._lineas), estados):
+            self.cancelar(producto, bool(cancelada))
+
+    def quitar(self, producto):
+        cantidad, precio, cancelada = self._lineas.pop(producto)
+        if not cancelada:
+            self.total -= cantidad * precio
+        self._cambio()
+
+    def vaciar(self):
+        self._lineas.clear()
+        self.total = 0.0
+        self._cambio()
+
+    def lineas_a_cobrar(self):
+        """(producto, cantidad, precio) de las lineas no canceladas."""
+        return [(producto, cantidad, precio)
+                for producto, (cantidad, precio, cancelada) in self._lineas.items() if not cancelada]
+
+    def tabla(self):
+        """DataFrame con las columnas de la tabla de ventas; se rearma solo si hubo cambios."""
+        if self._version_tabla != self._version:
+            import pandas as pd
+            self._tabla = pd.DataFrame(
+                [(producto, cantidad, precio, round(cantidad * precio, 2), cancelada)
+                 for producto, (cantidad, precio, cancelada) in self._lineas.items()],
+                columns=COLUMNAS)
+            self._version_tabla = self._version
+        return self._tabla
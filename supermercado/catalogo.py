@@ -0,0 +1,81 @@
+"""Catalogo de productos en memoria, recargado solo cuando cambia el catalogo.
+
+Cada rerun de Streamlit pide la lista de productos para los selectbox. En vez
+de leer y ordenar la tabla stock cada vez, el catalogo guarda una instantanea
+(nombres y precio vigente, sin cantidades) y la reutiliza mientras no cambie
+`catalogo_version` de stock y precios. Esa fila la incrementan triggers en las
+altas, bajas y cambios de nombre de productos y en cada precio nuevo; las
+ventas, que solo cambian cantidades, no la tocan.
+
+`PRAGMA data_version` sirve de filtro barato: si ninguna de las dos bases
+recibio escrituras de otra conexion no hace falta ni leer la version.
+"""
+import sqlite3
+import threading
+from collections import namedtuple
+
+# productos: nombres ordenados; por_codigo: codigo -> (producto, precio_venta);
+# por_nombre: producto -> codigo
+Instantanea = namedtuple('Instantanea', ['productos', 'por_codigo', 'por_nombre'])
+
+BASES_CATALOGO = ('stock', 'precios')
+
+
+class Catalogo:
+    """Instantanea cacheada de productos + precio de venta."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._control = {
+            base: sqlite3.connect(pool.ruta(base), isolation_level=None, check_same_thread=False)
+            for base in BASES_CATALOGO
+        }
+        self._datos = None
+        self._version = None
+        self._instantanea = None
+
+    def _datos_actual(self):
+        return tuple(con.execute('PRAGMA data_version').fetchone()[0]
+                     for con in self._control.values())
+
+    def _version_actual(self):
+        return tuple(con.execute('SELECT version FROM catalogo_version').fetchone()[0]
+                     for con in self._control.values())
+
+    def _cargar(self):
+        with self.pool.conexion('stock') as con:
+            filas_stock = con.execute(
+                'SELECT codigo, producto FROM stock ORDER BY producto').fetchall()
+        # Precios vigentes del historial (un registro abierto por codigo)
+        with self.pool.conexion('precios') as con:
+            filas_precios = con.execute(
+                'SELECT codigo, producto, precio_venta FROM historial_precios WHERE valid_to IS NULL').fetchall()
+
+        precio_codigo = {codigo: precio for codigo, _, precio in filas_precios if codigo is not None}
+        precio_nombre = {producto: precio for _, producto, precio in filas_precios}
+        por_codigo = {}
+        por_nombre = {}
+        for codigo, producto in filas_stock:
+            precio = precio_codigo.get(codigo, precio_nombre.get(producto))
+            por_codigo[codigo] = (producto, precio)
+            por_nombre[producto] = codigo
+        return Instantanea([fila[1] for fila in filas_stock], por_codigo, por_nombre)
+
+    def vigente(self):
+        """Devuelve la instantanea actual, recargandola si el catalogo cambio."""
+        with self._lock:
+            datos = self._datos_actual()
+            if datos == self._datos:
+                return self._instantanea
+            # La version se lee antes de cargar: un cambio durante la carga fuerza otra recarga
+            version = self._version_actual()
+            if version != self._version:
+                self._instantanea = self._cargar()
+                self._version = version
+            self._datos = datos
+            return self._instantanea
+
+    def cerrar(self):
+        for con in self._control.values():
+            con.close()
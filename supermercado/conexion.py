@@ -0,0 +1,160 @@
+"""Pool de conexiones SQLite compartido por todo el proceso.
+
+Cada base (stock, precios, ventas) vive en su propio archivo. El pool mantiene
+unas pocas conexiones abiertas por base y las presta a quien las pida, en vez
+de abrir una conexion nueva en cada rerun de Streamlit.
+
+Escrituras concurrentes: varias cajas (sesiones) comparten el proceso, asi
+que las transacciones de escritura del proceso se serializan con un lock y
+cada una toma el lock de SQLite con BEGIN IMMEDIATE, esperando busy_timeout
+y reintentando con espera creciente si otro proceso tiene la base tomada.
+Si no se consigue en un tiempo acotado se lanza BaseOcupada.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .instrumentacion import ConexionMedida
+
+BASES = ('stock', 'precios', 'ventas')
+
+# Bases adjuntadas (ATTACH) a las conexiones de otra base, para poder escribir
+# en ambas dentro de una misma transaccion
+ADJUNTAS = {
+    'stock': ('ventas', 'precios'),
+}
+
+# Pragmas aplicados a cada conexion nueva; los de PRAGMAS_ESQUEMA se repiten
+# para cada base adjuntada
+PRAGMAS = (
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=2000',
+)
+PRAGMAS_ESQUEMA = (
+    'PRAGMA {esquema}.journal_mode=WAL',
+    'PRAGMA {esquema}.synchronous=NORMAL',
+    'PRAGMA {esquema}.cache_size=-8000',
+)
+
+# Espera maxima por el lock de escritura del proceso (segundos) y reintentos de BEGIN IMMEDIATE
+ESPERA_ESCRITURA = 10
+REINTENTOS = 3
+
+
+def fecha_sql(valor=None):
+    """Fecha como texto con milisegundos ('AAAA-MM-DD HH:MM:SS.mmm'), el formato de las fechas de las
+    bases (ventas, movimientos, historial de precios). None es ahora; un texto se deja como esta."""
+    if isinstance(valor, str):
+        return valor
+    return (valor or datetime.now()).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def leer_sql(con, sql, parametros=()):
+    """DataFrame con el resultado de la consulta. pandas se importa recien aca, asi el paquete
+    se carga rapido en los procesos que no lo necesitan (linea de comandos, scripts)."""
+    import pandas as pd
+    return pd.read_sql_query(sql, con, params=parametros)
+
+
+class BaseOcupada(RuntimeError):
+    """No se pudo obtener el lock de escritura en el tiempo previsto."""
+
+
+class Pool:
+    """Conexiones reutilizables para las bases del supermercado."""
+
+    def __init__(self, directorio='.', tamanho=4, registro=None):
+        self.directorio = directorio
+        self.tamanho = tamanho
+        # Registro de instrumentacion opcional: si esta, todas las sentencias se miden
+        self.registro = registro
+        self._libres = {base: queue.LifoQueue() for base in BASES}
+        self._abiertas = []
+        self._lock = threading.Lock()
+        self._escritura = threading.RLock()
+
+    def ruta(self, base):
+        if base not in BASES:
+            raise ValueError(f"Base desconocida: {base}")
+        return os.path.join(self.directorio, f'{base}.db')
+
+    def _abrir(self, base):
+        # isolation_level=None: las transacciones se abren de forma explicita
+        if self.registro is None:
+            con = sqlite3.connect(self.ruta(base), isolation_level=None,
+                                  check_same_thread=False)
+        else:
+            con = sqlite3.connect(self.ruta(base), isolation_level=None,
+                                  check_same_thread=False, factory=ConexionMedida)
+            con.registro = self.registro
+        for adjunta in ADJUNTAS.get(base, ()):
+            con.execute('ATTACH DATABASE ? AS ' + adjunta, (self.ruta(adjunta),))
+        for pragma in PRAGMAS:
+            con.execute(pragma)
+        for esquema in ('main',) + ADJUNTAS.get(base, ()):
+            for pragma in PRAGMAS_ESQUEMA:
+                con.execute(pragma.format(esquema=esquema))
+        with self._lock:
+            self._abiertas.append(con)
+        return con
+
+    @contextmanager
+    def conexion(self, base):
+        """Presta una conexion de la base y la devuelve al salir."""
+        try:
+            con = self._libres[base].get_nowait()
+        except queue.Empty:
+            con = self._abrir(base)
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            if self._libres[base].qsize() < self.tamanho:
+                self._libres[base].put(con)
+            else:
+                with self._lock:
+                    self._abiertas.remove(con)
+                con.close()
+
+    @contextmanager
+    def transaccion(self, base):
+        """Conexion con una transaccion de escritura: commit al salir, rollback si falla."""
+        if not self._escritura.acquire(timeout=ESPERA_ESCRITURA):
+            raise BaseOcupada(f"Otra caja esta escribiendo en {base}; intente nuevamente")
+        try:
+            with self.conexion(base) as con:
+                self._comenzar(con, base)
+                try:
+                    yield con
+                except BaseException:
+                    con.rollback()
+                    raise
+                con.commit()
+        finally:
+            self._escritura.release()
+
+    def _comenzar(self, con, base):
+        # busy_timeout ya espera dentro de cada intento; aca se reintenta si otro proceso
+        # mantiene la base bloqueada mas tiempo
+        for intento in range(REINTENTOS):
+            try:
+                con.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as error:
+                if 'locked' not in str(error) and 'busy' not in str(error):
+                    raise
+                time.sleep(0.05 * 2 ** intento)
+        raise BaseOcupada(f"La base {base} esta bloqueada por otro proceso; intente nuevamente")
+
+    def cerrar(self):
+        with self._lock:
+            for con in self._abiertas:
+                con.close()
+            self._abiertas.clear()
+        for base in BASES:
+            self._libres[base] = queue.LifoQueue()
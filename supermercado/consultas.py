@@ -0,0 +1,124 @@
+"""Consultas paginadas: filtros, orden y paginado se resuelven en SQL.
+
+Solo la pagina visible se convierte en DataFrame; la exportacion a CSV se
+genera por bloques con fetchmany, sin cargar la tabla entera en pandas.
+"""
+import csv
+import io
+import tempfile
+from dataclasses import dataclass
+
+from .conexion import BASES, leer_sql
+
+TIPOS_NUMERICOS = ('INT', 'REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')
+
+
+@dataclass
+class Pagina:
+    # DataFrame con las filas de la pagina
+    datos: object
+    total: int
+    numero: int
+    tamanho: int
+
+    @property
+    def paginas(self):
+        return max(1, -(-self.total // self.tamanho))
+
+
+def columnas(pool, base):
+    """Devuelve {columna: es_numerica} de la tabla, en orden."""
+    if base not in BASES:
+        raise ValueError(f"Base desconocida: {base}")
+    with pool.conexion(base) as con:
+        filas = con.execute(f'PRAGMA main.table_info({base})').fetchall()
+    return {fila[1]: any(tipo in (fila[2] or '').upper() for tipo in TIPOS_NUMERICOS)
+            for fila in filas}
+
+
+def _where(cols, filtros):
+    """Arma el WHERE a partir de {columna: valor}; solo acepta columnas de la tabla."""
+    condiciones, parametros = [], []
+    for columna, valor in (filtros or {}).items():
+        if columna not in cols:
+            raise ValueError(f"Columna desconocida: {columna}")
+        if valor is None or str(valor).strip() == '':
+            continue
+        valor = str(valor).strip()
+        if cols[columna]:
+            try:
+                parametros.append(float(valor))
+            except ValueError:
+                raise ValueError(f"La columna {columna} es numerica: {valor!r}") from None
+            condiciones.append(f'{columna} = ?')
+        else:
+            condiciones.append(f'{columna} LIKE ?')
+            parametros.append(f'%{valor}%')
+    sql = ' WHERE ' + ' AND '.join(condiciones) if condiciones else ''
+    return sql, parametros
+
+
+def _order_by(cols, orden, descendente):
+    if orden is None:
+        return ' ORDER BY rowid'
+    if orden not in cols:
+        raise ValueError(f"Columna desconocida: {orden}")
+    sentido = 'DESC' if descendente else 'ASC'
+    # rowid desempata para que el paginado sea estable
+    return f' ORDER BY {orden} {sentido}, rowid {sentido}'
+
+
+def contar(pool, base, filtros=None):
+    """Cantidad de filas que cumplen los filtros."""
+    where, parametros = _where(columnas(pool, base), filtros)
+    with pool.conexion(base) as con:
+        return con.execute(f'SELECT COUNT(*) FROM main.{base}{where}', parametros).fetchone()[0]
+
+
+def pagina(pool, base, filtros=None, orden=None, descendente=False, numero=0, tamanho=50, total=None):
+    """Lee una pagina (numero empieza en 0) de la tabla `base`.
+
+    Si ya se conoce `total` (por ejemplo de `contar`) se evita repetir el COUNT.
+    """
+    cols = columnas(pool, base)
+    where, parametros = _where(cols, filtros)
+    with pool.conexion(base) as con:
+        if total is None:
+            total = con.execute(f'SELECT COUNT(*) FROM main.{base}{where}', parametros).fetchone()[0]
+        numero = max(0, min(numero, max(0, -(-total // tamanho) - 1)))
+        datos = leer_sql(
+            con, f'SELECT * FROM main.{base}{where}{_order_by(cols, orden, descendente)} LIMIT ? OFFSET ?',
+            parametros + [tamanho, numero * tamanho])
+    return Pagina(datos, total, numero, tamanho)
+
+
+def exportar_csv(pool, base, filtros=None, orden=None, descendente=False, bloque=5000):
+    """Genera el CSV de la consulta completa por bloques de texto."""
+    cols = columnas(pool, base)
+    where, parametros = _where(cols, filtros)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(cols)
+    with pool.conexion(base) as con:
+        cursor = con.execute(
+            f'SELECT * FROM main.{base}{where}{_order_by(cols, orden, descendente)}', parametros)
+        while True:
+            filas = cursor.fetchmany(bloque)
+            if not filas:
+                break
+            escritor.writerows(filas)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def archivo_csv(pool, base, filtros=None, orden=None, descendente=False):
+    """Archivo temporal (binario, al principio) con el CSV de la consulta, escrito bloque a bloque."""
+    # Hasta 8 MB queda en memoria, mas grande pasa a disco
+    archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    for texto in exportar_csv(pool, base, filtros, orden, descendente):
+        archivo.write(texto.encode('utf-8'))
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,242 @@
+"""Diario local de ventas por caja, aplicado a las bases en segundo plano.
+
+"Finalizar" solo agrega el ticket al diario de la caja (un archivo JSON
+lines, una linea por ticket, con fsync) y vuelve enseguida, aunque la base
+este lenta o bloqueada. Un hilo aplica los tickets anotados a ventas/stock
+de a lotes, cada lote en una transaccion. Cada ticket se anota en
+`tickets_diario` dentro de la misma transaccion, asi que un lote aplicado
+dos veces (por ejemplo si el proceso se corta antes de guardar la posicion)
+no duplica ventas.
+
+Cada caja tiene un solo Diario por proceso; varias sesiones de la misma caja
+pueden compartirlo. Otro proceso (por ejemplo `python -m supermercado
+cierre`) puede aplicar el mismo diario: agregar, leer, guardar la posicion y
+vaciar el archivo se hacen con un lock de archivo (`caja-N.jsonl.lock`), y
+los tickets pendientes se cuentan desde el archivo, no en memoria.
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from .caja import ResultadoVenta, registrar_ticket
+from .conexion import fecha_sql
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+CARPETA = 'diario'
+LOTE = 50
+# Espera entre reintentos cuando la base no responde (segundos, se duplica hasta el maximo)
+ESPERA = 0.5
+ESPERA_MAXIMA = 30
+# Con todo aplicado, el diario se vacia al superar este tamanho
+ROTAR_BYTES = 1_000_000
+
+
+def cajas(pool, carpeta=None):
+    """Nombres de las cajas que tienen diario en la carpeta."""
+    carpeta = carpeta or os.path.join(pool.directorio, CARPETA)
+    prefijo = len('caja-')
+    return sorted(os.path.basename(ruta)[prefijo:-len('.jsonl')]
+                  for ruta in glob.glob(os.path.join(carpeta, 'caja-*.jsonl')))
+
+
+class Diario:
+    """Diario de una caja y el hilo que lo aplica a las bases."""
+
+    def __init__(self, pool, caja, carpeta=None, lote=LOTE):
+        self.pool = pool
+        self.caja = str(caja)
+        carpeta = carpeta or os.path.join(pool.directorio, CARPETA)
+        os.makedirs(carpeta, exist_ok=True)
+        self.ruta = os.path.join(carpeta, f'caja-{self.caja}.jsonl')
+        self._ruta_posicion = self.ruta + '.pos'
+        self._ruta_lock = self.ruta + '.lock'
+        self.lote = lote
+        self._lock = threading.Lock()
+        self._hay = threading.Event()
+        self._parar = threading.Event()
+        self._hilo = None
+        # Resultados con rechazos o alertas, para mostrarlos en la caja
+        self.avisos = deque(maxlen=100)
+        self.error = None
+        self.aplicados = 0
+        with self._bloqueo():
+            self._reparar()
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # Archivo
+
+    @contextmanager
+    def _bloqueo(self):
+        """Lock del diario entre hilos (threading) y entre procesos (lock de archivo)."""
+        with self._lock, open(self._ruta_lock, 'a+b') as archivo:
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+            # Se suelta al cerrar el archivo
+            yield
+
+    def _reparar(self):
+        # Una linea cortada al final es un ticket cuyo fsync no termino: nunca se confirmo
+        if not os.path.exists(self.ruta):
+            open(self.ruta, 'ab').close()
+            return
+        with open(self.ruta, 'rb+') as archivo:
+            contenido = archivo.read()
+            if contenido and not contenido.endswith(b'\n'):
+                archivo.truncate(contenido.rfind(b'\n') + 1)
+
+    def _posicion(self):
+        try:
+            with open(self._ruta_posicion) as archivo:
+                posicion = int(archivo.read() or 0)
+        except FileNotFoundError:
+            return 0
+        # Diario vaciado despues de guardar la posicion: se relee desde el principio (es idempotente)
+        return posicion if posicion <= os.path.getsize(self.ruta) else 0
+
+    def _guardar_posicion(self, posicion):
+        temporal = self._ruta_posicion + '.tmp'
+        with open(temporal, 'w') as archivo:
+            archivo.write(str(posicion))
+        os.replace(temporal, self._ruta_posicion)
+
+    def _leer(self, posicion, cantidad):
+        """(tickets, posicion siguiente) desde `posicion`; `cantidad` None lee todos."""
+        tickets = []
+        with open(self.ruta, 'rb') as archivo:
+            archivo.seek(posicion)
+            for linea in archivo:
+                if cantidad is not None and len(tickets) >= cantidad:
+                    break
+                tickets.append(json.loads(linea))
+                posicion += len(linea)
+        return tickets, posicion
+
+    @property
+    def pendientes(self):
+        """Tickets anotados que todavia no se aplicaron, segun la posicion guardada."""
+        with self._bloqueo():
+            with open(self.ruta, 'rb') as archivo:
+                archivo.seek(self._posicion())
+                return sum(bloque.count(b'\n') for bloque in iter(lambda: archivo.read(1 << 16), b''))
+
+    def anotar(self, lineas, fecha=None):
+        """Agrega el ticket al diario y devuelve su id; la venta se registra en segundo plano."""
+        ticket = {
+            'id_ticket': uuid.uuid4().hex,
+            'fecha': fecha_sql(fecha),
+            'lineas': [[producto, int(cantidad), float(precio)] for producto, cantidad, precio in lineas],
+        }
+        linea = (json.dumps(ticket, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._bloqueo():
+            with open(self.ruta, 'ab') as archivo:
+                archivo.write(linea)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+        self._hay.set()
+        return ticket['id_ticket']
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # Aplicacion a las bases
+
+    def aplicar_lote(self):
+        """Aplica hasta `lote` tickets en una transaccion. Devuelve cuantos se leyeron del diario."""
+        with self._bloqueo():
+            posicion = self._posicion()
+            tickets, siguiente = self._leer(posicion, self.lote)
+        if not tickets:
+            return 0
+        resultados = []
+        aplicado = fecha_sql()
+        with self.pool.transaccion('stock') as con:
+            for ticket in tickets:
+                nuevo = con.execute('''INSERT INTO ventas.tickets_diario (id_ticket, caja, fecha, aplicado)
+                                    VALUES (?, ?, ?, ?) ON CONFLICT (id_ticket) DO NOTHING''',
+                                    (ticket['id_ticket'], self.caja, ticket['fecha'], aplicado)).rowcount
+                if not nuevo:
+                    continue
+                con.execute('SAVEPOINT ticket')
+                try:
+                    resultado = registrar_ticket(con, ticket['lineas'], ticket['fecha'], ticket['id_ticket'])
+                except sqlite3.OperationalError:
+                    raise
+                except Exception as error:
+                    # Un ticket que no se puede registrar no frena a los demas; queda como rechazado
+                    con.execute('ROLLBACK TO ticket')
+                    resultado = ResultadoVenta(ticket['id_ticket'], rechazadas=[
+                        (producto, cantidad, str(error)) for producto, cantidad, _ in ticket['lineas']])
+                con.execute('RELEASE ticket')
+                if resultado.rechazadas:
+                    con.execute('UPDATE ventas.tickets_diario SET rechazadas = ? WHERE id_ticket = ?',
+                                (len(resultado.rechazadas), resultado.id_ticket))
+                resultados.append(resultado)
+        self.aplicados += len(tickets)
+        self.avisos.extend(resultado for resultado in resultados if resultado.rechazadas or resultado.alertas)
+        with self._bloqueo():
+            # Si otro proceso movio la posicion (o vacio el diario) mientras tanto, se deja la suya:
+            # los tickets de este lote ya estan en tickets_diario y releerlos no los duplica
+            if self._posicion() == posicion:
+                self._guardar_posicion(siguiente)
+                if siguiente == os.path.getsize(self.ruta) and siguiente > ROTAR_BYTES:
+                    open(self.ruta, 'wb').close()
+                    self._guardar_posicion(0)
+        return len(tickets)
+
+    def aplicar_pendientes(self):
+        """Aplica todo lo anotado hasta ahora, sin hilo. Devuelve cuantos tickets se leyeron."""
+        total = 0
+        while True:
+            aplicados = self.aplicar_lote()
+            if not aplicados:
+                return total
+            total += aplicados
+
+    def _bucle(self):
+        espera = ESPERA
+        while not self._parar.is_set():
+            self._hay.wait(ESPERA_MAXIMA)
+            self._hay.clear()
+            try:
+                while self.aplicar_lote() and not self._parar.is_set():
+                    pass
+                self.error = None
+                espera = ESPERA
+            except Exception as error:
+                # Base bloqueada o inaccesible: los tickets siguen en el diario y se reintenta
+                self.error = error
+                self._parar.wait(espera)
+                espera = min(espera * 2, ESPERA_MAXIMA)
+                self._hay.set()
+
+    def iniciar(self):
+        """Arranca el hilo que aplica el diario (si no estaba corriendo)."""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._parar.clear()
+            self._hilo = threading.Thread(target=self._bucle, name=f'diario-caja-{self.caja}', daemon=True)
+            self._hilo.start()
+            self._hay.set()
+
+    def detener(self, timeout=None):
+        self._parar.set()
+        self._hay.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def vaciar_avisos(self):
+        avisos = []
+        while self.avisos:
+            avisos.append(self.avisos.popleft())
+        return avisos
@@ -0,0 +1,306 @@
+"""Migraciones versionadas del esquema.
+
+Cada base guarda en `schema_version` las migraciones ya aplicadas, asi que
+`migrar` solo hace trabajo real la primera vez que corre sobre una base; se
+llama una vez por proceso al construir el repositorio.
+
+SQLite no hace cumplir claves foraneas entre archivos distintos, por eso las
+relaciones por `codigo` con stock se mantienen rellenando el codigo que falte
+y con indices sobre `codigo` en precios y ventas.
+"""
+import sqlite3
+
+from .conexion import BASES
+
+# Bases que una migracion necesita ver (se adjuntan como ref_<base>)
+REFERENCIAS = {
+    'precios': ('stock',),
+    'ventas': ('stock',),
+}
+
+# Cuerpo de los triggers de historial_precios: cierra el precio vigente del codigo y abre el nuevo
+AHORA = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+HISTORIAL_CERRAR_Y_ABRIR = f'''UPDATE historial_precios SET valid_to = {AHORA}
+                    WHERE codigo = NEW.codigo AND valid_to IS NULL;
+                    INSERT INTO historial_precios (codigo, producto, precio_compra, precio_venta, valid_from)
+                    VALUES (NEW.codigo, NEW.producto, NEW.precio_compra, NEW.precio_venta, {AHORA});'''
+
+
+def alerta_recalcular(codigo, cantidad):
+    """Cuerpo de los triggers de alertas_stock: el codigo queda en alerta si su cantidad no supera el minimo."""
+    return f'''DELETE FROM alertas_stock WHERE codigo = {codigo} AND NOT EXISTS
+                        (SELECT 1 FROM niveles_stock n WHERE n.codigo = {codigo} AND {cantidad} <= n.minimo);
+                    INSERT INTO alertas_stock (codigo, cantidad, desde)
+                    SELECT n.codigo, {cantidad}, {AHORA} FROM niveles_stock n
+                    WHERE n.codigo = {codigo} AND {cantidad} <= n.minimo
+                    ON CONFLICT (codigo) DO UPDATE SET cantidad = excluded.cantidad;'''
+
+
+# Version del catalogo (una sola fila): el catalogo en memoria se recarga solo cuando cambia
+CATALOGO_VERSION = ('''CREATE TABLE IF NOT EXISTS catalogo_version
+                    (id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL)''',
+                    'INSERT OR IGNORE INTO catalogo_version (id, version) VALUES (1, 0)')
+
+
+def catalogo_version(nombre, evento, tabla, cuando=''):
+    """Trigger que incrementa catalogo_version despues de `evento` sobre `tabla`."""
+    return f'''CREATE TRIGGER IF NOT EXISTS {nombre} AFTER {evento} ON {tabla}{cuando}
+                BEGIN
+                    UPDATE catalogo_version SET version = version + 1;
+                END'''
+
+
+MIGRACIONES = {
+    'stock': [
+        (1, ('''CREATE TABLE IF NOT EXISTS stock
+                (codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+                producto VARCHAR(200) NOT NULL,
+                cantidad INTEGER NOT NULL)''',)),
+        (2, ('CREATE UNIQUE INDEX IF NOT EXISTS ux_stock_producto ON stock(producto)',)),
+        # Indice de texto (trigramas) sobre el nombre, para la busqueda del formulario de ventas
+        (3, ('''CREATE VIRTUAL TABLE IF NOT EXISTS stock_fts USING fts5
+                (producto, content='stock', content_rowid='codigo', tokenize='trigram')''',
+             "INSERT INTO stock_fts (stock_fts) VALUES ('rebuild')",
+             '''CREATE TRIGGER IF NOT EXISTS tr_stock_fts_insert AFTER INSERT ON stock
+                BEGIN
+                    INSERT INTO stock_fts (rowid, producto) VALUES (NEW.codigo, NEW.producto);
+                END''',
+             '''CREATE TRIGGER IF NOT EXISTS tr_stock_fts_delete AFTER DELETE ON stock
+                BEGIN
+                    INSERT INTO stock_fts (stock_fts, rowid, producto) VALUES ('delete', OLD.codigo, OLD.producto);
+                END''',
+             '''CREATE TRIGGER IF NOT EXISTS tr_stock_fts_update AFTER UPDATE OF producto ON stock
+                BEGIN
+                    INSERT INTO stock_fts (stock_fts, rowid, producto) VALUES ('delete', OLD.codigo, OLD.producto);
+                    INSERT INTO stock_fts (rowid, producto) VALUES (NEW.codigo, NEW.producto);
+                END''')),
+        # Libro de movimientos de stock y fotos periodicas de los saldos; la primera foto
+        # es el stock al momento de migrar
+        (4, ('''CREATE TABLE IF NOT EXISTS movimientos_stock
+                (id_movimiento INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha TEXT NOT NULL,
+                codigo INTEGER NOT NULL,
+                delta INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                referencia TEXT)''',
+             'CREATE INDEX IF NOT EXISTS ix_movimientos_codigo ON movimientos_stock(codigo, id_movimiento)',
+             'CREATE INDEX IF NOT EXISTS ix_movimientos_fecha ON movimientos_stock(fecha)',
+             '''CREATE TABLE IF NOT EXISTS snapshots_stock
+                (id_snapshot INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha TEXT NOT NULL,
+                ultimo_movimiento INTEGER NOT NULL)''',
+             'CREATE INDEX IF NOT EXISTS ix_snapshots_fecha ON snapshots_stock(fecha)',
+             '''CREATE TABLE IF NOT EXISTS snapshot_saldos
+                (id_snapshot INTEGER NOT NULL,
+                codigo INTEGER NOT NULL,
+                cantidad INTEGER NOT NULL,
+                PRIMARY KEY (id_snapshot, codigo)) WITHOUT ROWID''',
+             f'INSERT INTO snapshots_stock (fecha, ultimo_movimiento) VALUES ({AHORA}, 0)',
+             '''INSERT INTO snapshot_saldos (id_snapshot, codigo, cantidad)
+                SELECT (SELECT MAX(id_snapshot) FROM snapshots_stock), codigo, cantidad FROM stock''')),
+        # Niveles minimo/objetivo por producto y conjunto de productos por reponer, mantenido por
+        # triggers en cada cambio de cantidad o de nivel (leerlo no recorre todo el stock)
+        (5, ('''CREATE TABLE IF NOT EXISTS niveles_stock
+                (codigo INTEGER PRIMARY KEY,
+                minimo INTEGER NOT NULL,
+                objetivo INTEGER)''',
+             '''CREATE TABLE IF NOT EXISTS alertas_stock
+                (codigo INTEGER PRIMARY KEY,
+                cantidad INTEGER NOT NULL,
+                desde TEXT NOT NULL)''',
+             f'''CREATE TRIGGER IF NOT EXISTS tr_stock_alerta AFTER UPDATE OF cantidad ON stock
+                WHEN NEW.cantidad IS NOT OLD.cantidad
+                BEGIN
+                    {alerta_recalcular('NEW.codigo', 'NEW.cantidad')}
+                END''',
+             '''CREATE TRIGGER IF NOT EXISTS tr_stock_alerta_delete AFTER DELETE ON stock
+                BEGIN
+                    DELETE FROM alertas_stock WHERE codigo = OLD.codigo;
+                    DELETE FROM niveles_stock WHERE codigo = OLD.codigo;
+                END''',
+             f'''CREATE TRIGGER IF NOT EXISTS tr_niveles_alerta_insert AFTER INSERT ON niveles_stock
+                BEGIN
+                    {alerta_recalcular('NEW.codigo', '(SELECT cantidad FROM stock WHERE codigo = NEW.codigo)')}
+                END''',
+             f'''CREATE TRIGGER IF NOT EXISTS tr_niveles_alerta_update AFTER UPDATE ON niveles_stock
+                BEGIN
+                    {alerta_recalcular('NEW.codigo', '(SELECT cantidad FROM stock WHERE codigo = NEW.codigo)')}
+                END''',
+             '''CREATE TRIGGER IF NOT EXISTS tr_niveles_alerta_delete AFTER DELETE ON niveles_stock
+                BEGIN
+                    DELETE FROM alertas_stock WHERE codigo = OLD.codigo;
+                END''')),
+        # El catalogo cambia con altas, bajas y cambios de nombre; las ventas (cantidad) no lo tocan
+        (6, CATALOGO_VERSION + (
+            catalogo_version('tr_stock_catalogo_insert', 'INSERT', 'stock'),
+            catalogo_version('tr_stock_catalogo_delete', 'DELETE', 'stock'),
+            catalogo_version('tr_stock_catalogo_update', 'UPDATE OF producto', 'stock',
+                             ' WHEN NEW.producto IS NOT OLD.producto'))),
+    ],
+    'precios': [
+        (1, ('''CREATE TABLE IF NOT EXISTS precios
+                (id_precio INTEGER PRIMARY KEY AUTOINCREMENT,
+                codigo INTEGER,
+                producto VARCHAR(200) NOT NULL,
+                precio_compra REAL,
+                precio_venta REAL,
+                FOREIGN KEY (codigo, producto) REFERENCES stock(codigo, producto))''',)),
+        (2, ('''UPDATE precios SET codigo =
+                (SELECT s.codigo FROM ref_stock.stock s WHERE s.producto = precios.producto)
+                WHERE codigo IS NULL''',
+             'CREATE INDEX IF NOT EXISTS ix_precios_producto ON precios(producto)',
+             'CREATE INDEX IF NOT EXISTS ix_precios_codigo ON precios(codigo)')),
+        # Un solo precio vigente por codigo en precios, e historial con vigencia
+        # [valid_from, valid_to) mantenido por triggers en cada alta o cambio de precio.
+        # Los precios ya cargados se toman como vigentes desde siempre
+        (3, ('''DELETE FROM precios WHERE codigo IS NOT NULL AND id_precio NOT IN
+                (SELECT MAX(id_precio) FROM precios WHERE codigo IS NOT NULL GROUP BY codigo)''',
+             'DROP INDEX IF EXISTS ix_precios_codigo',
+             'CREATE UNIQUE INDEX IF NOT EXISTS ux_precios_codigo ON precios(codigo)',
+             '''CREATE TABLE IF NOT EXISTS historial_precios
+                (id_historial INTEGER PRIMARY KEY AUTOINCREMENT,
+                codigo INTEGER NOT NULL,
+                producto VARCHAR(200) NOT NULL,
+                precio_compra REAL,
+                precio_venta REAL,
+                valid_from TEXT NOT NULL,
+                valid_to TEXT)''',
+             'CREATE INDEX IF NOT EXISTS ix_historial_codigo_desde ON historial_precios(codigo, valid_from)',
+             '''CREATE UNIQUE INDEX IF NOT EXISTS ux_historial_vigente ON historial_precios(codigo)
+                WHERE valid_to IS NULL''',
+             '''INSERT INTO historial_precios (codigo, producto, precio_compra, precio_venta, valid_from)
+                SELECT codigo, producto, precio_compra, precio_venta, '1970-01-01 00:00:00.000'
+                FROM precios WHERE codigo IS NOT NULL''',
+             f'''CREATE TRIGGER IF NOT EXISTS tr_precios_historial_insert AFTER INSERT ON precios
+                WHEN NEW.codigo IS NOT NULL
+                BEGIN
+                    {HISTORIAL_CERRAR_Y_ABRIR}
+                END''',
+             f'''CREATE TRIGGER IF NOT EXISTS tr_precios_historial_update
+                AFTER UPDATE OF precio_compra, precio_venta ON precios
+                WHEN NEW.codigo IS NOT NULL AND (NEW.precio_compra IS NOT OLD.precio_compra
+                                                 OR NEW.precio_venta IS NOT OLD.precio_venta)
+                BEGIN
+                    {HISTORIAL_CERRAR_Y_ABRIR}
+                END''')),
+        # El catalogo toma el precio vigente del historial
+        (4, CATALOGO_VERSION + (
+            catalogo_version('tr_historial_catalogo_insert', 'INSERT', 'historial_precios'),
+            catalogo_version('tr_historial_catalogo_update', 'UPDATE', 'historial_precios'),
+            catalogo_version('tr_historial_catalogo_delete', 'DELETE', 'historial_precios'))),
+    ],
+    'ventas': [
+        (1, ('''CREATE TABLE IF NOT EXISTS ventas
+                (id_venta INTEGER PRIMARY KEY AUTOINCREMENT,
+                codigo INTEGER,
+                producto VARCHAR(200) NOT NULL,
+                cantidad INTEGER NOT NULL,
+                FOREIGN KEY (codigo) REFERENCES stock(codigo))''',)),
+        (2, ('''UPDATE ventas SET codigo =
+                (SELECT s.codigo FROM ref_stock.stock s WHERE s.producto = ventas.producto)
+                WHERE codigo IS NULL''',
+             'CREATE INDEX IF NOT EXISTS ix_ventas_codigo ON ventas(codigo)',
+             'CREATE INDEX IF NOT EXISTS ix_ventas_producto ON ventas(producto)')),
+        # Ventas con fecha, ticket y precio al momento de la venta, y resumenes
+        # por producto/dia, dia y mes mantenidos por triggers en cada insercion
+        (3, ('ALTER TABLE ventas ADD COLUMN fecha TEXT',
+             'ALTER TABLE ventas ADD COLUMN id_ticket TEXT',
+             'ALTER TABLE ventas ADD COLUMN precio_unitario REAL',
+             'ALTER TABLE ventas ADD COLUMN subtotal REAL',
+             'CREATE INDEX IF NOT EXISTS ix_ventas_fecha ON ventas(fecha)',
+             'CREATE INDEX IF NOT EXISTS ix_ventas_ticket ON ventas(id_ticket)',
+             '''CREATE TABLE IF NOT EXISTS resumen_producto_dia
+                (dia TEXT NOT NULL,
+                codigo INTEGER NOT NULL,
+                unidades INTEGER NOT NULL DEFAULT 0,
+                importe REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, codigo))''',
+             '''CREATE TABLE IF NOT EXISTS resumen_dia
+                (dia TEXT PRIMARY KEY,
+                tickets INTEGER NOT NULL DEFAULT 0,
+                unidades INTEGER NOT NULL DEFAULT 0,
+                importe REAL NOT NULL DEFAULT 0)''',
+             '''CREATE TABLE IF NOT EXISTS resumen_mes
+                (mes TEXT PRIMARY KEY,
+                tickets INTEGER NOT NULL DEFAULT 0,
+                unidades INTEGER NOT NULL DEFAULT 0,
+                importe REAL NOT NULL DEFAULT 0)''',
+             '''CREATE TRIGGER IF NOT EXISTS tr_ventas_resumen AFTER INSERT ON ventas
+                WHEN NEW.fecha IS NOT NULL
+                BEGIN
+                    INSERT INTO resumen_producto_dia (dia, codigo, unidades, importe)
+                    VALUES (substr(NEW.fecha, 1, 10), NEW.codigo, NEW.cantidad, COALESCE(NEW.subtotal, 0))
+                    ON CONFLICT (dia, codigo) DO UPDATE SET
+                        unidades = unidades + excluded.unidades,
+                        importe = importe + excluded.importe;
+                    INSERT INTO resumen_dia (dia, tickets, unidades, importe)
+                    VALUES (substr(NEW.fecha, 1, 10),
+                            (SELECT COUNT(*) = 1 FROM ventas WHERE id_ticket = NEW.id_ticket),
+                            NEW.cantidad, COALESCE(NEW.subtotal, 0))
+                    ON CONFLICT (dia) DO UPDATE SET
+                        tickets = tickets + excluded.tickets,
+                        unidades = unidades + excluded.unidades,
+                        importe = importe + excluded.importe;
+                    INSERT INTO resumen_mes (mes, tickets, unidades, importe)
+                    VALUES (substr(NEW.fecha, 1, 7),
+                            (SELECT COUNT(*) = 1 FROM ventas WHERE id_ticket = NEW.id_ticket),
+                            NEW.cantidad, COALESCE(NEW.subtotal, 0))
+                    ON CONFLICT (mes) DO UPDATE SET
+                        tickets = tickets + excluded.tickets,
+                        unidades = unidades + excluded.unidades,
+                        importe = importe + excluded.importe;
+                END''')),
+        # Indices cubrientes para los analisis: resumen por producto sin recorrer todos los dias, y
+        # lineas de un producto en un rango de fechas con lo necesario para el margen (reemplaza a
+        # ix_ventas_codigo, que es su prefijo)
+        (4, ('''CREATE INDEX IF NOT EXISTS ix_resumen_producto_codigo
+                ON resumen_producto_dia(codigo, dia, unidades, importe)''',
+             'CREATE INDEX IF NOT EXISTS ix_ventas_codigo_fecha ON ventas(codigo, fecha, cantidad, subtotal)',
+             'DROP INDEX IF EXISTS ix_ventas_codigo')),
+        # Tickets aplicados desde los diarios de caja: volver a aplicar un ticket no lo duplica
+        (5, ('''CREATE TABLE IF NOT EXISTS tickets_diario
+                (id_ticket TEXT PRIMARY KEY,
+                caja TEXT NOT NULL,
+                fecha TEXT NOT NULL,
+                aplicado TEXT NOT NULL,
+                rechazadas INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID''',)),
+    ],
+}
+
+
+def version_actual(con, esquema='main'):
+    con.execute(f'''CREATE TABLE IF NOT EXISTS {esquema}.schema_version
+                (version INTEGER PRIMARY KEY,
+                aplicada TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)''')
+    fila = con.execute(f'SELECT MAX(version) FROM {esquema}.schema_version').fetchone()
+    return fila[0] or 0
+
+
+def migrar(pool):
+    """Aplica las migraciones pendientes de las tres bases. Devuelve {base: version}."""
+    versiones = {}
+    # stock primero: las otras bases lo leen para rellenar codigos
+    for base in BASES:
+        con = sqlite3.connect(pool.ruta(base), isolation_level=None)
+        try:
+            for referencia in REFERENCIAS.get(base, ()):
+                con.execute(f'ATTACH DATABASE ? AS ref_{referencia}', (pool.ruta(referencia),))
+            con.execute('BEGIN IMMEDIATE')
+            version = version_actual(con)
+            for numero, sentencias in MIGRACIONES[base]:
+                if numero <= version:
+                    continue
+                for sentencia in sentencias:
+                    con.execute(sentencia)
+                con.execute('INSERT INTO schema_version (version) VALUES (?)', (numero,))
+                version = numero
+            con.commit()
+            versiones[base] = version
+        except BaseException:
+            if con.in_transaction:
+                con.rollback()
+            raise
+        finally:
+            con.close()
+    return versiones
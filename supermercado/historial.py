@@ -0,0 +1,53 @@
+"""Historial de precios con vigencia (valid_from, valid_to).
+
+`historial_precios` lo mantienen los triggers de la tabla precios. Las
+consultas "precio vigente" y "precio al momento T" usan los indices
+(codigo) WHERE valid_to IS NULL y (codigo, valid_from).
+"""
+from .conexion import fecha_sql, leer_sql
+
+
+def precio_vigente(pool, codigo):
+    """(precio_compra, precio_venta) vigente del codigo, o None."""
+    with pool.conexion('precios') as con:
+        return con.execute('SELECT precio_compra, precio_venta FROM historial_precios '
+                           'WHERE codigo = ? AND valid_to IS NULL', (codigo,)).fetchone()
+
+
+def precio_al(pool, codigo, fecha):
+    """(precio_compra, precio_venta) que regia para el codigo en `fecha`, o None."""
+    with pool.conexion('precios') as con:
+        return con.execute('''SELECT precio_compra, precio_venta FROM historial_precios
+                           WHERE codigo = ? AND valid_from <= ?
+                           ORDER BY valid_from DESC, id_historial DESC LIMIT 1''',
+                           (codigo, fecha_sql(fecha))).fetchone()
+
+
+def historial(pool, codigo):
+    """Todos los precios que tuvo el codigo, del mas reciente al mas antiguo."""
+    with pool.conexion('precios') as con:
+        return leer_sql(con, '''SELECT precio_compra, precio_venta, valid_from, valid_to
+                             FROM historial_precios WHERE codigo = ?
+                             ORDER BY valid_from DESC, id_historial DESC''', (codigo,))
+
+
+def ventas_valorizadas(pool, desde=None, hasta=None):
+    """Lineas de venta con el costo (precio_compra) vigente cuando se vendieron y el margen."""
+    condiciones, parametros = ['v.fecha IS NOT NULL'], []
+    if desde is not None:
+        condiciones.append('v.fecha >= ?')
+        parametros.append(fecha_sql(desde))
+    if hasta is not None:
+        condiciones.append('v.fecha < ?')
+        parametros.append(fecha_sql(hasta))
+    with pool.conexion('stock') as con:
+        return leer_sql(
+            con, f'''SELECT v.id_venta, v.fecha, v.codigo, v.producto, v.cantidad, v.precio_unitario, v.subtotal,
+                       (SELECT h.precio_compra FROM precios.historial_precios h
+                        WHERE h.codigo = v.codigo AND h.valid_from <= v.fecha
+                        ORDER BY h.valid_from DESC, h.id_historial DESC LIMIT 1) * v.cantidad AS costo,
+                       v.subtotal - (SELECT h.precio_compra FROM precios.historial_precios h
+                        WHERE h.codigo = v.codigo AND h.valid_from <= v.fecha
+                        ORDER BY h.valid_from DESC, h.id_historial DESC LIMIT 1) * v.cantidad AS margen
+                FROM ventas.ventas v WHERE {' AND '.join(condiciones)} ORDER BY v.fecha''',
+            parametros)
@@ -0,0 +1,163 @@
+"""Importacion masiva de mercaderia y listas de precios desde CSV o Excel.
+
+El archivo se lee por bloques, cada bloque se valida con operaciones
+vectorizadas de pandas y todo se confirma en una sola transaccion sobre la
+conexion de stock (que tiene adjuntada la base de precios).
+
+Columnas reconocidas: producto (obligatoria), cantidad, precio_compra y
+precio_venta. Si el archivo trae `cantidad` se suma al stock y los productos
+nuevos se crean; si no la trae se trata como lista de precios y los
+productos que no existen se rechazan.
+"""
+import csv
+import zipfile
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from . import inventario
+
+COLUMNAS = ('producto', 'cantidad', 'precio_compra', 'precio_venta')
+# Limite de parametros por sentencia de SQLite
+MAX_PARAMETROS = 900
+
+
+@dataclass
+class ResumenImportacion:
+    insertados: int = 0
+    actualizados: int = 0
+    precios: int = 0
+    rechazados: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=['fila', 'producto', 'motivo']))
+
+
+def leer_bloques(archivo, nombre, tamanho=5000):
+    """Genera DataFrames de a `tamanho` filas desde un CSV o un XLSX.
+
+    Los errores de lectura (codificacion, formato, falta del motor de Excel) se
+    informan como ValueError.
+    """
+    try:
+        if nombre.lower().endswith(('.xlsx', '.xls')):
+            # read_excel no lee por bloques: se lee la hoja y se corta en pedazos
+            hoja = pd.read_excel(archivo, dtype=str)
+            for inicio in range(0, len(hoja), tamanho):
+                yield hoja.iloc[inicio:inicio + tamanho]
+        else:
+            yield from pd.read_csv(archivo, dtype=str, chunksize=tamanho, sep=None, engine='python')
+    except ImportError as error:
+        raise ValueError(f"No se puede leer {nombre}: falta el paquete {error.name or 'de Excel'}") from error
+    except UnicodeDecodeError as error:
+        raise ValueError(f"{nombre} no esta en UTF-8; guardelo como 'CSV UTF-8' e intente nuevamente") from error
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, csv.Error, zipfile.BadZipFile) as error:
+        raise ValueError(f"No se pudo leer {nombre}: {error}") from error
+
+
+def validar(bloque, con_cantidad):
+    """Devuelve (validas, rechazadas) con las columnas ya normalizadas."""
+    validas = pd.DataFrame({'fila': bloque.index + 2})
+    validas['producto'] = bloque['producto'].fillna('').astype(str).str.strip().to_numpy()
+    motivo = pd.Series('', index=validas.index)
+    motivo[validas['producto'] == ''] = 'producto vacio'
+
+    columnas_numericas = [c for c in COLUMNAS[1:] if c in bloque.columns]
+    for columna in columnas_numericas:
+        texto = bloque[columna].fillna('').astype(str).str.strip().str.replace(',', '.', regex=False)
+        valores = pd.to_numeric(texto.to_numpy(), errors='coerce')
+        validas[columna] = valores
+        invalido = (texto.to_numpy() != '') & (pd.isna(valores) | (valores < 0))
+        motivo[invalido & (motivo == '')] = f'valor invalido en {columna}'
+
+    if con_cantidad:
+        cantidad = validas['cantidad']
+        motivo[(cantidad.isna() | (cantidad % 1 != 0)) & (motivo == '')] = 'cantidad vacia o no entera'
+
+    rechazadas = validas.loc[motivo != '', ['fila', 'producto']].assign(motivo=motivo[motivo != ''])
+    return validas[motivo == ''], rechazadas
+
+
+def _codigos(con, nombres):
+    codigos = {}
+    for inicio in range(0, len(nombres), MAX_PARAMETROS):
+        parte = nombres[inicio:inicio + MAX_PARAMETROS]
+        marcas = ', '.join('?' * len(parte))
+        codigos.update((producto, codigo) for codigo, producto in con.execute(
+            f'SELECT codigo, producto FROM main.stock WHERE producto IN ({marcas})', parte))
+    return codigos
+
+
+def importar(pool, archivo, nombre, tamanho=5000):
+    """Importa el archivo completo en una transaccion y devuelve un ResumenImportacion."""
+    resumen = ResumenImportacion()
+    rechazos = []
+    with pool.transaccion('stock') as con:
+        for bloque in leer_bloques(archivo, nombre, tamanho):
+            bloque = bloque.rename(columns=lambda c: str(c).strip().lower())
+            if 'producto' not in bloque.columns:
+                raise ValueError("El archivo no tiene la columna 'producto'")
+            con_cantidad = 'cantidad' in bloque.columns
+            validas, rechazadas = validar(bloque, con_cantidad)
+            rechazos.append(rechazadas)
+            if validas.empty:
+                continue
+
+            # Filas repetidas del mismo producto: se suman las cantidades y vale el ultimo precio
+            agregados = {'fila': 'first'}
+            if con_cantidad:
+                agregados['cantidad'] = 'sum'
+            agregados.update({c: 'last' for c in ('precio_compra', 'precio_venta') if c in validas})
+            validas = validas.groupby('producto', sort=False, as_index=False).agg(agregados)
+
+            nombres = validas['producto'].tolist()
+            existentes = _codigos(con, nombres)
+            nuevos = ~validas['producto'].isin(list(existentes))
+
+            if con_cantidad:
+                con.executemany(
+                    '''INSERT INTO main.stock (producto, cantidad) VALUES (?, ?)
+                       ON CONFLICT (producto) DO UPDATE SET cantidad = cantidad + excluded.cantidad''',
+                    zip(nombres, validas['cantidad'].astype(int).tolist()))
+                resumen.insertados += int(nuevos.sum())
+                resumen.actualizados += int((~nuevos).sum())
+                codigos = _codigos(con, nombres)
+                cantidades = validas['cantidad'].astype(int).tolist()
+                for tipo, seleccion in (('alta', nuevos.tolist()), ('ingreso', (~nuevos).tolist())):
+                    # La referencia del movimiento es el nombre del archivo importado
+                    inventario.registrar(con, [(codigos[producto], cantidad) for producto, cantidad, elegido
+                                               in zip(nombres, cantidades, seleccion) if elegido],
+                                         tipo, nombre)
+            else:
+                rechazos.append(validas.loc[nuevos, ['fila', 'producto']].assign(motivo='no existe en el stock'))
+                validas = validas[~nuevos]
+                codigos = existentes
+
+            columnas_precio = [c for c in ('precio_compra', 'precio_venta') if c in validas.columns]
+            if not columnas_precio:
+                continue
+            con_precios = validas.dropna(subset=columnas_precio, how='all')
+            precios = [
+                (codigos[fila.producto], fila.producto,
+                 _o_none(getattr(fila, 'precio_compra', None)),
+                 _o_none(getattr(fila, 'precio_venta', None)))
+                for fila in con_precios.itertuples(index=False)
+            ]
+            # Se actualiza el precio existente y se inserta el de los productos que no tenian
+            con.executemany(
+                '''UPDATE precios.precios SET
+                   precio_compra = COALESCE(?, precio_compra), precio_venta = COALESCE(?, precio_venta)
+                   WHERE codigo = ?''',
+                [(compra, venta, codigo) for codigo, _, compra, venta in precios])
+            con.executemany(
+                '''INSERT INTO precios.precios (codigo, producto, precio_compra, precio_venta)
+                   SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM precios.precios WHERE codigo = ?)''',
+                [(codigo, producto, compra, venta, codigo) for codigo, producto, compra, venta in precios])
+            resumen.precios += len(precios)
+
+    rechazos = [rechazadas for rechazadas in rechazos if not rechazadas.empty]
+    if rechazos:
+        resumen.rechazados = pd.concat(rechazos, ignore_index=True)
+    return resumen
+
+
+def _o_none(valor):
+    return None if valor is None or pd.isna(valor) else float(valor)
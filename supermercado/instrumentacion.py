@@ -0,0 +1,181 @@
+"""Medicion de sentencias SQL y de reruns de Streamlit.
+
+Las conexiones del pool se crean con `ConexionMedida` cuando el pool recibe
+un `Registro`: cada execute/executemany/commit se cronometra y se cuentan las
+filas leidas. Cada rerun del script se mide entre `iniciar_rerun` y
+`terminar_rerun`, se guarda en un historial por pantalla (para p50/p95) y se
+escribe como una linea JSON en un log rotativo.
+"""
+import json
+import logging
+import logging.handlers
+import sqlite3
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+
+
+def normalizar(sql):
+    return ' '.join(sql.split())[:200]
+
+
+class CursorMedido(sqlite3.Cursor):
+    _clave = None
+
+    def _medir(self, metodo, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, parametros)
+        finally:
+            self._clave = normalizar(sql)
+            self.connection.registro.sentencia(self._clave, time.perf_counter() - inicio)
+
+    def execute(self, sql, parametros=()):
+        return self._medir(super().execute, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self._medir(super().executemany, sql, parametros)
+
+    def _filas(self, filas, inicio):
+        self.connection.registro.filas(self._clave, filas, time.perf_counter() - inicio)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        self._filas(fila is not None, inicio)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        filas = super().fetchmany(*args, **kwargs)
+        self._filas(len(filas), inicio)
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        self._filas(len(filas), inicio)
+        return filas
+
+    def __next__(self):
+        fila = super().__next__()
+        self.connection.registro.filas(self._clave, 1, 0)
+        return fila
+
+
+class ConexionMedida(sqlite3.Connection):
+    """Conexion que informa cada sentencia a `self.registro`."""
+    registro = None
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            self.registro.sentencia('COMMIT', time.perf_counter() - inicio)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Registro:
+    """Acumula estadisticas de SQL y de reruns; seguro entre hilos (una sesion por hilo)."""
+
+    def __init__(self, historial=500, log=None, log_bytes=1_000_000, log_copias=3):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # sql normalizado -> [ejecuciones, segundos, filas]
+        self.sentencias = defaultdict(lambda: [0, 0.0, 0])
+        self.reruns = defaultdict(lambda: deque(maxlen=historial))
+        self._log = None
+        if log:
+            self._log = logging.getLogger(f'supermercado.diagnostico.{id(self)}')
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            self._log.addHandler(logging.handlers.RotatingFileHandler(
+                log, maxBytes=log_bytes, backupCount=log_copias, encoding='utf-8'))
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # SQL
+
+    def sentencia(self, clave, segundos):
+        with self._lock:
+            estadistica = self.sentencias[clave]
+            estadistica[0] += 1
+            estadistica[1] += segundos
+        actual = getattr(self._local, 'rerun', None)
+        if actual is not None:
+            actual['consultas'] += 1
+            actual['sql_ms'] += segundos * 1000
+
+    def filas(self, clave, filas, segundos):
+        with self._lock:
+            estadistica = self.sentencias[clave]
+            estadistica[1] += segundos
+            estadistica[2] += filas
+        actual = getattr(self._local, 'rerun', None)
+        if actual is not None:
+            actual['filas'] += filas
+            actual['sql_ms'] += segundos * 1000
+
+    def top_sentencias(self, cantidad=10):
+        with self._lock:
+            filas = [{'sql': clave, 'ejecuciones': n, 'total_ms': round(segundos * 1000, 2),
+                      'promedio_ms': round(segundos * 1000 / n, 3) if n else 0, 'filas': leidas}
+                     for clave, (n, segundos, leidas) in self.sentencias.items()]
+        return sorted(filas, key=lambda fila: fila['total_ms'], reverse=True)[:cantidad]
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # Reruns
+
+    def iniciar_rerun(self):
+        self._local.rerun = {'pantalla': None, 'inicio': time.perf_counter(),
+                             'consultas': 0, 'sql_ms': 0.0, 'filas': 0}
+
+    def marcar_pantalla(self, pantalla):
+        actual = getattr(self._local, 'rerun', None)
+        if actual is not None:
+            actual['pantalla'] = pantalla
+
+    def terminar_rerun(self):
+        actual = getattr(self._local, 'rerun', None)
+        if actual is None:
+            return None
+        self._local.rerun = None
+        actual['total_ms'] = (time.perf_counter() - actual.pop('inicio')) * 1000
+        actual['resto_ms'] = actual['total_ms'] - actual['sql_ms']
+        with self._lock:
+            self.reruns[actual['pantalla']].append(actual)
+        if self._log is not None:
+            self._log.info(json.dumps(dict(actual, fecha=time.strftime('%Y-%m-%dT%H:%M:%S')),
+                                      ensure_ascii=False))
+        return actual
+
+    def resumen(self):
+        """p50/p95 de cada pantalla: tiempo total, tiempo en SQL y consultas por rerun."""
+        with self._lock:
+            historial = {pantalla: list(reruns) for pantalla, reruns in self.reruns.items()}
+        filas = []
+        for pantalla, reruns in historial.items():
+            totales = [r['total_ms'] for r in reruns]
+            sql = [r['sql_ms'] for r in reruns]
+            filas.append({
+                'pantalla': pantalla, 'reruns': len(reruns),
+                'p50_ms': round(statistics.median(totales), 2), 'p95_ms': round(percentil(totales, 0.95), 2),
+                'sql_p50_ms': round(statistics.median(sql), 2), 'sql_p95_ms': round(percentil(sql, 0.95), 2),
+                'consultas': round(statistics.mean(r['consultas'] for r in reruns), 1),
+                'filas': round(statistics.mean(r['filas'] for r in reruns), 1),
+            })
+        return filas
@@ -0,0 +1,114 @@
+"""Libro de movimientos de stock con fotos (snapshots) periodicas.
+
+Cada cambio de `stock.cantidad` hecho por la aplicacion se anota en
+`movimientos_stock` con su tipo (venta, ingreso, alta, ajuste, cancelacion)
+dentro de la misma transaccion. Cada CADA_SNAPSHOT movimientos se guarda una
+foto de todos los saldos, asi el stock a una fecha se calcula con la ultima
+foto anterior mas los movimientos posteriores, sin recorrer todo el libro.
+"""
+from .conexion import fecha_sql, leer_sql
+
+TIPOS = ('venta', 'ingreso', 'alta', 'ajuste', 'cancelacion')
+CADA_SNAPSHOT = 10000
+
+
+def registrar(con, movimientos, tipo, referencia=None, fecha=None):
+    """Anota (codigo, delta) en el libro; `con` es una conexion de stock dentro de una transaccion."""
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de movimiento desconocido: {tipo}")
+    fecha = fecha_sql(fecha)
+    con.executemany('INSERT INTO main.movimientos_stock (fecha, codigo, delta, tipo, referencia) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(fecha, codigo, delta, tipo, referencia) for codigo, delta in movimientos if delta])
+    ultimo, foto = con.execute('''SELECT (SELECT MAX(id_movimiento) FROM main.movimientos_stock),
+                               (SELECT MAX(ultimo_movimiento) FROM main.snapshots_stock)''').fetchone()
+    if (ultimo or 0) - (foto or 0) >= CADA_SNAPSHOT:
+        _tomar_snapshot(con, fecha)
+
+
+def _tomar_snapshot(con, fecha=None):
+    cursor = con.execute('''INSERT INTO main.snapshots_stock (fecha, ultimo_movimiento)
+                         VALUES (?, COALESCE((SELECT MAX(id_movimiento) FROM main.movimientos_stock), 0))''',
+                         (fecha_sql(fecha),))
+    con.execute('INSERT INTO main.snapshot_saldos (id_snapshot, codigo, cantidad) '
+                'SELECT ?, codigo, cantidad FROM main.stock', (cursor.lastrowid,))
+    return cursor.lastrowid
+
+
+def tomar_snapshot(pool):
+    """Guarda una foto de todos los saldos (por ejemplo al cierre del dia)."""
+    with pool.transaccion('stock') as con:
+        return _tomar_snapshot(con)
+
+
+def stock_al(pool, fecha):
+    """DataFrame (codigo, producto, cantidad) con el stock que habia en `fecha`."""
+    fecha = fecha_sql(fecha)
+    with pool.conexion('stock') as con:
+        foto = con.execute('''SELECT id_snapshot, ultimo_movimiento FROM main.snapshots_stock
+                           WHERE fecha <= ? ORDER BY fecha DESC, id_snapshot DESC LIMIT 1''', (fecha,)).fetchone()
+        if foto is None:
+            raise ValueError(f"No hay registro de stock anterior a {fecha}")
+        return leer_sql(
+            con,
+            '''SELECT t.codigo, s.producto, SUM(t.cantidad) AS cantidad FROM (
+                   SELECT codigo, cantidad FROM main.snapshot_saldos WHERE id_snapshot = ?
+                   UNION ALL
+                   SELECT codigo, delta FROM main.movimientos_stock WHERE id_movimiento > ? AND fecha <= ?
+               ) t LEFT JOIN main.stock s ON s.codigo = t.codigo
+               GROUP BY t.codigo ORDER BY s.producto''',
+            (foto[0], foto[1], fecha))
+
+
+def ajustar(pool, producto, contada, referencia=None):
+    """Lleva el stock del producto a la cantidad contada y anota la diferencia como ajuste.
+
+    Devuelve la diferencia (negativa si falta mercaderia) o None si el producto no existe.
+    """
+    with pool.transaccion('stock') as con:
+        fila = con.execute('SELECT codigo, cantidad FROM main.stock WHERE producto = ?', (producto,)).fetchone()
+        if fila is None:
+            return None
+        codigo, cantidad = fila
+        delta = contada - cantidad
+        con.execute('UPDATE main.stock SET cantidad = cantidad + ? WHERE codigo = ?', (delta, codigo))
+        registrar(con, [(codigo, delta)], 'ajuste', referencia)
+    return delta
+
+
+def mermas(pool, desde=None, hasta=None):
+    """Faltantes detectados por ajustes de conteo, por producto, de mayor a menor."""
+    condiciones, parametros = ["m.tipo = 'ajuste'", 'm.delta < 0'], []
+    if desde is not None:
+        condiciones.append('m.fecha >= ?')
+        parametros.append(fecha_sql(desde))
+    if hasta is not None:
+        condiciones.append('m.fecha < ?')
+        parametros.append(fecha_sql(hasta))
+    with pool.conexion('stock') as con:
+        return leer_sql(
+            con,
+            f'''SELECT m.codigo, s.producto, -SUM(m.delta) AS faltante, COUNT(*) AS ajustes
+                FROM main.movimientos_stock m LEFT JOIN main.stock s ON s.codigo = m.codigo
+                WHERE {' AND '.join(condiciones)} GROUP BY m.codigo ORDER BY faltante DESC''',
+            parametros)
+
+
+def auditoria(pool):
+    """Productos cuyo stock no coincide con la ultima foto mas el libro (cambios fuera del libro)."""
+    with pool.conexion('stock') as con:
+        return leer_sql(
+            con,
+            '''WITH foto AS (SELECT id_snapshot, ultimo_movimiento FROM main.snapshots_stock
+                             ORDER BY id_snapshot DESC LIMIT 1),
+                    libro AS (SELECT codigo, SUM(cantidad) AS cantidad FROM (
+                        SELECT codigo, cantidad FROM main.snapshot_saldos
+                        WHERE id_snapshot = (SELECT id_snapshot FROM foto)
+                        UNION ALL
+                        SELECT codigo, delta FROM main.movimientos_stock
+                        WHERE id_movimiento > (SELECT ultimo_movimiento FROM foto)
+                    ) GROUP BY codigo)
+               SELECT s.codigo, s.producto, s.cantidad AS stock, COALESCE(l.cantidad, 0) AS segun_libro,
+                      s.cantidad - COALESCE(l.cantidad, 0) AS diferencia
+               FROM main.stock s LEFT JOIN libro l ON l.codigo = s.codigo
+               WHERE s.cantidad IS NOT COALESCE(l.cantidad, 0)''')
@@ -0,0 +1,90 @@
+"""Remarcacion masiva de precios de venta.
+
+Los precios nuevos se calculan vectorizados sobre toda la tabla precios, se
+muestran como vista previa y se aplican con un unico UPDATE ... FROM contra
+una tabla temporal.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .conexion import leer_sql
+
+TIPOS = ('porcentaje', 'markup')
+
+
+@dataclass
+class Regla:
+    """`porcentaje`: precio_venta * (1 + valor/100); `markup`: precio_compra * (1 + valor/100).
+
+    `redondeo` (0.90, 0.99 o None) sube el precio a la siguiente terminacion.
+    """
+    tipo: str
+    valor: float
+    redondeo: float = None
+
+
+@dataclass
+class Filtro:
+    """`texto`: el nombre contiene el texto; `margen_maximo`: margen sobre el precio de venta, en %."""
+    texto: str = ''
+    margen_maximo: float = None
+
+
+def calcular(precios, regla):
+    """Precio nuevo para cada fila del DataFrame (columnas precio_compra, precio_venta)."""
+    if regla.tipo not in TIPOS:
+        raise ValueError(f"Tipo de regla desconocido: {regla.tipo}")
+    factor = 1 + regla.valor / 100
+    base = precios['precio_venta'] if regla.tipo == 'porcentaje' else precios['precio_compra']
+    nuevo = base.astype(float) * factor
+    if regla.redondeo is not None:
+        nuevo = np.ceil(nuevo - regla.redondeo - 1e-9) + regla.redondeo
+    return nuevo.round(2)
+
+
+def vista_previa(pool, regla, filtro=None):
+    """DataFrame con los precios actuales, el nuevo y la diferencia de los productos afectados."""
+    filtro = filtro or Filtro()
+    with pool.conexion('precios') as con:
+        # Un precio sin codigo no se puede remarcar: en la tabla temporal tomaria un rowid cualquiera
+        precios = leer_sql(
+            con, 'SELECT codigo, producto, precio_compra, precio_venta FROM precios WHERE codigo IS NOT NULL')
+        precios['codigo'] = precios['codigo'].astype(int)
+
+    seleccion = pd.Series(True, index=precios.index)
+    if filtro.texto:
+        seleccion &= precios['producto'].str.contains(filtro.texto, case=False, regex=False)
+    if filtro.margen_maximo is not None:
+        margen = (precios['precio_venta'] - precios['precio_compra']) / precios['precio_venta'] * 100
+        seleccion &= margen < filtro.margen_maximo
+
+    vista = precios[seleccion].copy()
+    vista['precio_nuevo'] = calcular(vista, regla)
+    vista = vista.dropna(subset=['precio_nuevo'])
+    vista = vista[vista['precio_nuevo'] != vista['precio_venta']]
+    vista['diferencia'] = (vista['precio_nuevo'] - vista['precio_venta']).round(2)
+    return vista.reset_index(drop=True)
+
+
+def aplicar(pool, vista):
+    """Aplica la vista previa. Solo cambia los precios que siguen iguales a los de la vista.
+
+    Devuelve la cantidad de precios modificados.
+    """
+    if vista.empty:
+        return 0
+    with pool.transaccion('precios') as con:
+        con.execute('''CREATE TEMP TABLE IF NOT EXISTS remarcacion
+                    (codigo INTEGER PRIMARY KEY, precio_anterior REAL, precio_nuevo REAL)''')
+        con.execute('DELETE FROM temp.remarcacion')
+        filas = vista.dropna(subset=['codigo'])[['codigo', 'precio_venta', 'precio_nuevo']]
+        con.executemany('INSERT OR REPLACE INTO temp.remarcacion VALUES (?, ?, ?)',
+                        ((int(codigo), anterior, nuevo) for codigo, anterior, nuevo in filas.itertuples(index=False)))
+        # IS y no =: un producto importado solo con precio de compra tiene precio_venta NULL
+        cursor = con.execute('''UPDATE precios SET precio_venta = r.precio_nuevo
+                             FROM temp.remarcacion r
+                             WHERE precios.codigo = r.codigo AND precios.precio_venta IS r.precio_anterior''')
+        con.execute('DELETE FROM temp.remarcacion')
+        return cursor.rowcount
@@ -0,0 +1,42 @@
+"""Reportes de ventas leidos de las tablas de resumen (resumen_dia, resumen_mes,
+resumen_producto_dia), que se mantienen al registrar cada venta."""
+from .conexion import leer_sql
+
+
+def _rango(columna, desde, hasta):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append(f'{columna} >= ?')
+        parametros.append(str(desde))
+    if hasta is not None:
+        condiciones.append(f'{columna} <= ?')
+        parametros.append(str(hasta))
+    return (' WHERE ' + ' AND '.join(condiciones) if condiciones else ''), parametros
+
+
+def ventas_por_dia(pool, desde=None, hasta=None):
+    """Tickets, unidades e importe por dia ('YYYY-MM-DD')."""
+    where, parametros = _rango('dia', desde, hasta)
+    with pool.conexion('ventas') as con:
+        return leer_sql(con, f'SELECT dia, tickets, unidades, importe FROM resumen_dia{where} ORDER BY dia',
+                        parametros)
+
+
+def ventas_por_mes(pool, desde=None, hasta=None):
+    """Tickets, unidades e importe por mes ('YYYY-MM')."""
+    where, parametros = _rango('mes', desde, hasta)
+    with pool.conexion('ventas') as con:
+        return leer_sql(con, f'SELECT mes, tickets, unidades, importe FROM resumen_mes{where} ORDER BY mes',
+                        parametros)
+
+
+def ventas_por_producto(pool, desde=None, hasta=None):
+    """Unidades e importe por producto en el rango de dias, de mayor a menor importe."""
+    where, parametros = _rango('r.dia', desde, hasta)
+    with pool.conexion('stock') as con:
+        return leer_sql(
+            con, f'''SELECT r.codigo, s.producto, SUM(r.unidades) AS unidades, SUM(r.importe) AS importe
+                FROM ventas.resumen_producto_dia r
+                LEFT JOIN main.stock s ON s.codigo = r.codigo{where}
+                GROUP BY r.codigo ORDER BY importe DESC''',
+            parametros)
@@ -0,0 +1,87 @@
+"""Niveles de stock y alertas de reposicion.
+
+Cada producto puede tener un `minimo` (cuando la cantidad no lo supera el
+producto necesita reposicion) y un `objetivo` (hasta donde conviene reponer).
+Los productos por reponer viven en `alertas_stock`, que los triggers de la
+base mantienen en cada cambio de cantidad (por ejemplo al cerrar una venta),
+asi que la lista se lee sin recorrer todo el stock. La cantidad sugerida se
+calcula con la velocidad de venta de las tablas de resumen.
+"""
+from datetime import date, timedelta
+
+from .conexion import leer_sql
+
+# Dias de ventas que se promedian y dias de venta que deberia cubrir una reposicion
+DIAS_VENTAS = 28
+COBERTURA = 14
+
+
+def fijar_nivel(pool, producto, minimo, objetivo=None):
+    """Guarda (o reemplaza) los niveles del producto. Devuelve False si el producto no existe."""
+    with pool.transaccion('stock') as con:
+        cursor = con.execute('''INSERT INTO niveles_stock (codigo, minimo, objetivo)
+                             SELECT codigo, ?, ? FROM stock WHERE producto = ?
+                             ON CONFLICT (codigo) DO UPDATE SET
+                                 minimo = excluded.minimo, objetivo = excluded.objetivo''',
+                             (int(minimo), None if objetivo is None else int(objetivo), producto))
+        return cursor.rowcount > 0
+
+
+def quitar_nivel(pool, producto):
+    with pool.transaccion('stock') as con:
+        con.execute('DELETE FROM niveles_stock WHERE codigo = (SELECT codigo FROM stock WHERE producto = ?)',
+                    (producto,))
+
+
+def niveles(pool):
+    """DataFrame (codigo, producto, cantidad, minimo, objetivo) de los productos con niveles."""
+    with pool.conexion('stock') as con:
+        return leer_sql(
+            con, '''SELECT n.codigo, s.producto, s.cantidad, n.minimo, n.objetivo
+                    FROM niveles_stock n JOIN stock s ON s.codigo = n.codigo ORDER BY s.producto''')
+
+
+def pendientes(pool):
+    """Productos por reponer: (codigo, producto, cantidad, minimo, objetivo, desde)."""
+    with pool.conexion('stock') as con:
+        return leer_sql(
+            con, '''SELECT a.codigo, s.producto, a.cantidad, n.minimo, n.objetivo, a.desde
+                    FROM alertas_stock a
+                    JOIN niveles_stock n ON n.codigo = a.codigo
+                    JOIN stock s ON s.codigo = a.codigo
+                    ORDER BY a.desde''')
+
+
+def en_alerta(con, codigos):
+    """[(producto, cantidad)] de los codigos que estan por reponer; `con` es una conexion de stock."""
+    codigos = list(codigos)
+    if not codigos:
+        return []
+    marcas = ', '.join('?' * len(codigos))
+    return con.execute(f'''SELECT s.producto, a.cantidad FROM main.alertas_stock a
+                       JOIN main.stock s ON s.codigo = a.codigo
+                       WHERE a.codigo IN ({marcas}) ORDER BY s.producto''', codigos).fetchall()
+
+
+def velocidad(pool, dias=DIAS_VENTAS, hasta=None):
+    """Serie codigo -> unidades vendidas por dia, promedio de los ultimos `dias` dias hasta `hasta`."""
+    hasta = hasta or date.today()
+    desde = hasta - timedelta(days=dias - 1)
+    with pool.conexion('ventas') as con:
+        ventas = leer_sql(con, 'SELECT codigo, unidades FROM resumen_producto_dia WHERE dia >= ? AND dia <= ?',
+                          (desde.isoformat(), hasta.isoformat()))
+    return ventas.groupby('codigo')['unidades'].sum() / dias
+
+
+def sugerencias(pool, dias=DIAS_VENTAS, cobertura=COBERTURA):
+    """Pendientes con la velocidad de venta y la cantidad sugerida para reponer.
+
+    Se repone hasta el mayor entre el objetivo y el minimo mas `cobertura` dias de venta.
+    """
+    import numpy as np
+    alertas = pendientes(pool)
+    alertas['por_dia'] = alertas['codigo'].map(velocidad(pool, dias)).fillna(0).round(2)
+    hasta = np.maximum(alertas['objetivo'].fillna(0),
+                       alertas['minimo'] + np.ceil(alertas['por_dia'] * cobertura))
+    alertas['sugerido'] = (hasta - alertas['cantidad']).clip(lower=0).astype(int)
+    return alertas
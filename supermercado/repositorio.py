@@ -0,0 +1,91 @@
+"""Capa de acceso a datos: todas las consultas SQL de la aplicacion pasan por aca."""
+from . import inventario
+from .catalogo import Catalogo
+from .conexion import Pool
+from .esquema import migrar
+
+
+def abrir(directorio='.', registro=None):
+    """Repositorio sobre las bases de `directorio`, con las migraciones pendientes aplicadas."""
+    pool = Pool(directorio, registro=registro)
+    migrar(pool)
+    return Repositorio(pool)
+
+
+class Repositorio:
+    """Operaciones sobre stock, precios y ventas usando un Pool compartido."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.catalogo = Catalogo(pool)
+
+    # ---------------------------------------------------------------------------------------------------------------------
+    # Stock
+
+    def codigo_de(self, producto):
+        with self.pool.conexion('stock') as con:
+            fila = con.execute("SELECT codigo FROM stock WHERE producto=?", (producto,)).fetchone()
+        return None if fila is None else fila[0]
+
+    def productos(self):
+        """Nombres de todos los productos, ordenados (desde el catalogo cacheado)."""
+        return self.catalogo.vigente().productos
+
+    def insertar_producto(self, producto, cantidad):
+        """Crea el producto; devuelve False si ya existia."""
+        with self.pool.transaccion('stock') as con:
+            cursor = con.execute('INSERT INTO stock (producto, cantidad) VALUES (?, ?) '
+                                 'ON CONFLICT (producto) DO NOTHING',
+                                 (producto, cantidad))
+            if cursor.rowcount != 1:
+                return False
+            inventario.registrar(con, [(cursor.lastrowid, cantidad)], 'alta')
+            return True
+
+    # Los cambios de stock son relativos (cantidad = cantidad + ?) para que dos cajas
+    # que escriben a la vez no se pisen el resultado, y se anotan en el libro de movimientos
+
+    def sumar_cantidad(self, producto, cantidad, tipo='ingreso'):
+        """Suma al stock y devuelve el stock nuevo, o None si el producto no existe."""
+        with self.pool.transaccion('stock') as con:
+            fila = con.execute("UPDATE stock SET cantidad = cantidad + ? WHERE producto=? RETURNING codigo, cantidad",
+                               (cantidad, producto)).fetchone()
+            if fila is None:
+                return None
+            inventario.registrar(con, [(fila[0], cantidad)], tipo)
+        return fila[1]
+
+    # ---------------------------------------------------------------------------------------------------------------------
+    # Precios
+
+    def precios_de(self, producto):
+        """Devuelve (precio_compra, precio_venta) o None si el producto no tiene precio."""
+        with self.pool.conexion('precios') as con:
+            return con.execute("SELECT precio_compra, precio_venta FROM precios WHERE producto=?",
+                               (producto,)).fetchone()
+
+    def precio_venta(self, producto):
+        """Precio de venta vigente desde el catalogo cacheado, o None si no tiene precio."""
+        instantanea = self.catalogo.vigente()
+        codigo = instantanea.por_nombre.get(producto)
+        return None if codigo is None else instantanea.por_codigo[codigo][1]
+
+    def insertar_precio(self, codigo, producto, precio_compra, precio_venta):
+        """Carga el precio; devuelve False si el producto ya tenia uno."""
+        with self.pool.transaccion('precios') as con:
+            cursor = con.execute('INSERT INTO precios (codigo, producto, precio_compra, precio_venta) '
+                                 'VALUES (?, ?, ?, ?) ON CONFLICT (codigo) DO NOTHING',
+                                 (codigo, producto, precio_compra, precio_venta))
+            return cursor.rowcount == 1
+
+    def agregar_precio(self, producto, precio_compra, precio_venta):
+        """Como `insertar_precio` buscando el codigo; ValueError si el producto no esta en el stock."""
+        codigo = self.codigo_de(producto)
+        if codigo is None:
+            raise ValueError(f"No se encontró el producto {producto} en el stock")
+        return self.insertar_precio(codigo, producto, precio_compra, precio_venta)
+
+    def actualizar_precio(self, producto, precio_compra, precio_venta):
+        with self.pool.transaccion('precios') as con:
+            con.execute('UPDATE precios SET precio_compra=?, precio_venta=? WHERE producto=?',
+                        (precio_compra, precio_venta, producto))
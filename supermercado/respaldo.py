@@ -0,0 +1,163 @@
+"""Respaldos en linea de las tres bases, sin detener las cajas.
+
+Para que stock, precios y ventas queden del mismo instante se toma el lock
+de escritura un momento (BEGIN IMMEDIATE sobre la conexion de stock, que
+tiene las otras dos adjuntadas), se abre una transaccion de lectura en las
+tres bases desde una conexion propia y se suelta el lock. Con WAL esa
+lectura ve siempre el mismo estado aunque las cajas sigan escribiendo, y la
+copia se hace con la API de backup de SQLite de a `paginas` paginas, con
+una pausa entre pasos.
+
+Cada respaldo es una carpeta `respaldos/AAAAMMDD-HHMMSS` con stock.db,
+precios.db y ventas.db. El ultimo queda sin comprimir para restaurarlo
+rapido; los anteriores se comprimen con gzip y se borran los que exceden
+`conservar`.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+from .conexion import ADJUNTAS, BASES
+
+CARPETA = 'respaldos'
+PAGINAS = 256
+PAUSA = 0.005
+CONSERVAR = 14
+
+
+def carpeta(pool):
+    return os.path.join(pool.directorio, CARPETA)
+
+
+def _lectura_consistente(pool):
+    """Conexion con una transaccion de lectura abierta en las tres bases, del mismo instante."""
+    lector = sqlite3.connect(pool.ruta('stock'), isolation_level=None, check_same_thread=False)
+    for adjunta in ADJUNTAS['stock']:
+        lector.execute('ATTACH DATABASE ? AS ' + adjunta, (pool.ruta(adjunta),))
+    # Mientras dure la transaccion nadie confirma escrituras; son unos milisegundos
+    with pool.transaccion('stock'):
+        lector.execute('BEGIN')
+        for esquema in ('main',) + ADJUNTAS['stock']:
+            lector.execute(f'SELECT COUNT(*) FROM {esquema}.sqlite_master').fetchone()
+    return lector
+
+
+def respaldar(pool, destino=None, paginas=PAGINAS, pausa=PAUSA):
+    """Copia las tres bases a una carpeta nueva dentro de `destino` y devuelve su ruta."""
+    destino = destino or carpeta(pool)
+    ruta = os.path.join(destino, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    temporal = ruta + '.tmp'
+    os.makedirs(temporal, exist_ok=True)
+    lector = _lectura_consistente(pool)
+    try:
+        esquemas = {'stock': 'main', **{adjunta: adjunta for adjunta in ADJUNTAS['stock']}}
+        for base in BASES:
+            copia = sqlite3.connect(os.path.join(temporal, f'{base}.db'))
+            try:
+                lector.backup(copia, pages=paginas, name=esquemas[base], sleep=pausa)
+                # La copia queda como un archivo unico, sin -wal
+                copia.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                copia.close()
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+    finally:
+        lector.close()
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def respaldos(destino):
+    """Carpetas de respaldo completas, de la mas nueva a la mas vieja."""
+    if not os.path.isdir(destino):
+        return []
+    return sorted((nombre for nombre in os.listdir(destino)
+                   if not nombre.endswith('.tmp') and os.path.isdir(os.path.join(destino, nombre))),
+                  reverse=True)
+
+
+def rotar(destino, conservar=CONSERVAR):
+    """Comprime los respaldos anteriores al ultimo y borra los que exceden `conservar`."""
+    nombres = respaldos(destino)
+    for nombre in nombres[conservar:]:
+        shutil.rmtree(os.path.join(destino, nombre))
+    for nombre in nombres[1:conservar]:
+        for base in BASES:
+            archivo = os.path.join(destino, nombre, f'{base}.db')
+            if not os.path.exists(archivo):
+                continue
+            with open(archivo, 'rb') as origen, gzip.open(archivo + '.gz.tmp', 'wb') as comprimido:
+                shutil.copyfileobj(origen, comprimido)
+            os.replace(archivo + '.gz.tmp', archivo + '.gz')
+            os.remove(archivo)
+
+
+class Respaldos:
+    """Corre respaldos en un hilo aparte, a pedido o cada `cada` segundos."""
+
+    def __init__(self, pool, destino=None, conservar=CONSERVAR):
+        self.pool = pool
+        self.destino = destino or carpeta(pool)
+        self.conservar = conservar
+        self.ultimo = None
+        self.error = None
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+    @property
+    def en_curso(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def _correr(self):
+        try:
+            self.ultimo = respaldar(self.pool, self.destino)
+            rotar(self.destino, self.conservar)
+            self.error = None
+        except Exception as error:
+            self.error = error
+
+    def iniciar(self):
+        """Arranca un respaldo en segundo plano; devuelve False si ya hay uno en curso."""
+        with self._lock:
+            if self.en_curso:
+                return False
+            self._hilo = threading.Thread(target=self._correr, name='respaldo', daemon=True)
+            self._hilo.start()
+            return True
+
+    def _espera_inicial(self, cada):
+        """Segundos hasta que el ultimo respaldo en `destino` cumpla `cada` (0 si no hay o ya vencio)."""
+        for nombre in respaldos(self.destino):
+            try:
+                ultimo = datetime.strptime(nombre, '%Y%m%d-%H%M%S')
+            except ValueError:
+                continue
+            return max(0.0, cada - (datetime.now() - ultimo).total_seconds())
+        return 0.0
+
+    def programar(self, cada):
+        """Respaldo automatico cada `cada` segundos hasta `detener`.
+
+        El primero se calcula desde el ultimo respaldo en disco, asi un reinicio
+        del proceso no posterga el respaldo.
+        """
+        def bucle():
+            espera = self._espera_inicial(cada)
+            while not self._parar.wait(espera):
+                if self.iniciar():
+                    self._hilo.join()
+                espera = cada
+        threading.Thread(target=bucle, name='respaldo-programado', daemon=True).start()
+
+    def detener(self):
+        self._parar.set()
+
+    def esperar(self, timeout=None):
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)